@@ -1,9 +1,18 @@
-from typing import TypeVar, cast
-from utils import LoadingBarMocker, Node
-from pathfinding import PathFinder
-from file_handling import read_complete
+from array import array
+from utils import LoadingBarMocker, Preprocess, UNREACHABLE
+from pathfinding import INFINITY, PathFinder
+from file_handling import read_complete_bidirectional
+import mmap
+import multiprocessing
+import os
+import struct
 import sys
 
+MAGIC = b"PFLMARK\0"
+VERSION = 1
+HEADER = struct.Struct("=8sIIq")
+HEADER_SIZE = 64
+
 ICELAND_LANDMARKS = {
     5129: "Keflavik",
     20567: "Tálknafjörður",
@@ -21,100 +30,209 @@ SCANDINAVIA_LANDMARKS = {
 
 def calculate_distances_from_landmark(
     pathfinder: PathFinder, landmark: int, landmark_name: str
-) -> list[float | int]:
+) -> array:
     pathfinder.run_dijkstra(
         landmark, loading_desc=f"Calculating distances from {landmark_name}..."
     )
-    return pathfinder.best_distances
+    return array(
+        "I",
+        (
+            UNREACHABLE if distance == INFINITY else distance
+            for distance in pathfinder.best_distances
+        ),
+    )
 
 
 def distances_from_landmarks(
     pathfinder: PathFinder, landmarks: dict[int, str]
-) -> list[list[float | int]]:
+) -> Preprocess:
     return [
         calculate_distances_from_landmark(pathfinder, landmark, landmark_name)
         for landmark, landmark_name in landmarks.items()
     ]
 
 
+def landmark_tables(
+    pathfinder: PathFinder, landmarks: dict[int, str]
+) -> tuple[Preprocess, Preprocess]:
+    print("---Reversed nodes---")
+    reverse_pathfinder = PathFinder(
+        pathfinder.get_reverse_nodes(), pathfinder.loading_bar
+    )
+    reverse_pathfinder.queue = pathfinder.queue
+    to_landmarks = distances_from_landmarks(reverse_pathfinder, landmarks)
+    print("---Forwards nodes---")
+    from_landmarks = distances_from_landmarks(pathfinder, landmarks)
+    return to_landmarks, from_landmarks
+
+
+# Search state of a preprocessing worker process, one PathFinder per direction.
+worker_pathfinders: dict[bool, PathFinder] = dict()
+
+
+def init_worker(node_file: str, edges_file: str, place_file: str, queue: str):
+    # The graphs are opened from the graph cache, which maps the files read
+    # only. Every worker shares the same pages instead of getting a copy.
+    nodes, reverse_nodes = read_complete_bidirectional(
+        node_file, edges_file, place_file
+    )
+    worker_pathfinders[False] = PathFinder(nodes)
+    worker_pathfinders[True] = PathFinder(reverse_nodes)
+    for pathfinder in worker_pathfinders.values():
+        pathfinder.queue = queue
+
+
+def worker_distances_from_landmark(task: tuple[int, str, bool]) -> array:
+    landmark, landmark_name, reverse = task
+    return calculate_distances_from_landmark(
+        worker_pathfinders[reverse], landmark, landmark_name
+    )
+
+
+def parallel_distances_from_landmarks(
+    node_file: str,
+    edges_file: str,
+    place_file: str,
+    landmarks: dict[int, str],
+    workers: int,
+    queue: str = "heap",
+) -> tuple[Preprocess, Preprocess]:
+    # Make sure both graph caches exist before the workers open them.
+    read_complete_bidirectional(node_file, edges_file, place_file)
+
+    tasks = [
+        (landmark, landmark_name, reverse)
+        for reverse in (True, False)
+        for landmark, landmark_name in landmarks.items()
+    ]
+    with multiprocessing.Pool(
+        min(workers, len(tasks)),
+        initializer=init_worker,
+        initargs=(node_file, edges_file, place_file, queue),
+    ) as pool:
+        tables = pool.map(worker_distances_from_landmark, tasks, chunksize=1)
+    return tables[: len(landmarks)], tables[len(landmarks) :]
+
+
 def preprocess(
     node_file: str,
     edges_file: str,
     place_file: str,
     landmarks: dict[int, str],
     loading_bar: bool = False,
+    workers: int = 1,
+    queue: str = "heap",
 ) -> PathFinder:
-    reverse_nodes = read_complete(
-        node_file, edges_file, place_file, reverse=True, loading_bar=loading_bar
-    )
-    pathfinder = PathFinder(reverse_nodes, loading_bar)
+    # queue is the priority queue of the landmark searches, see PathFinder.
+    if workers > 1:
+        to_landmarks, from_landmarks = parallel_distances_from_landmarks(
+            node_file, edges_file, place_file, landmarks, workers, queue
+        )
+        nodes, reverse_nodes = read_complete_bidirectional(
+            node_file, edges_file, place_file, loading_bar=loading_bar
+        )
+        pathfinder = PathFinder(nodes, loading_bar, reverse_nodes)
+        pathfinder.set_preprocess(to_landmarks, from_landmarks)
+        return pathfinder
 
-    print("---Reversed nodes---")
-    to_landmarks = distances_from_landmarks(pathfinder, landmarks)
-    del reverse_nodes, pathfinder
+    nodes, reverse_nodes = read_complete_bidirectional(
+        node_file, edges_file, place_file, loading_bar=loading_bar
+    )
+    pathfinder = PathFinder(nodes, loading_bar, reverse_nodes)
+    pathfinder.queue = queue
+    pathfinder.set_preprocess(*landmark_tables(pathfinder, landmarks))
+    return pathfinder
 
-    print("---Forwards nodes---")
-    nodes = read_complete(node_file, edges_file, place_file, loading_bar=loading_bar)
-    pathfinder = PathFinder(nodes, loading_bar)
-    from_landmarks = distances_from_landmarks(pathfinder, landmarks)
 
-    pathfinder.set_preprocess(to_landmarks, from_landmarks)
-    return pathfinder
+def write_landmark_tables(
+    to_landmarks: Preprocess,
+    from_landmarks: Preprocess,
+    preprocess_file_name: str,
+):
+    number_of_landmarks = len(to_landmarks)
+    number_of_nodes = len(to_landmarks[0])
+    with open(preprocess_file_name, "wb") as f:
+        f.write(
+            HEADER.pack(MAGIC, VERSION, number_of_landmarks, number_of_nodes).ljust(
+                HEADER_SIZE, b"\0"
+            )
+        )
+        for landmark in (*to_landmarks, *from_landmarks):
+            if not isinstance(landmark, (array, memoryview)):
+                landmark = array("I", landmark)
+            assert len(landmark) == number_of_nodes
+            f.write(memoryview(landmark).cast("B"))
 
 
 def save_preprocess(
     pathfinder: PathFinder,
     preprocess_file_name: str,
 ) -> PathFinder:
-    number_of_landmarks = len(pathfinder.to_landmarks)
-    number_of_nodes = len(pathfinder.to_landmarks[0])
-    tab = "\t"
-    with open(preprocess_file_name, "w") as f:
-        f.write(f"{number_of_landmarks}\t{number_of_nodes}\n")
-        for i in range(number_of_nodes):
-            line = f"\
-{tab.join(map(lambda l: str(l[i]), pathfinder.to_landmarks))}\t\
-{tab.join(map(lambda l: str(l[i]), pathfinder.from_landmarks))}\n"
-            f.write(line)
+    write_landmark_tables(
+        pathfinder.to_landmarks, pathfinder.from_landmarks, preprocess_file_name
+    )
     return pathfinder
 
 
-def load_preprocess(
+def load_preprocess(preprocess_file_name: str) -> tuple[Preprocess, Preprocess]:
+    print("Reading preprocess...")
+    with open(preprocess_file_name, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, number_of_landmarks, number_of_nodes = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError(
+            f"{preprocess_file_name} is not a landmark file, "
+            "use convert_preprocess if it is a preprocess.csv file"
+        )
+    if version != VERSION:
+        raise ValueError(f"Unsupported landmark file version {version}")
+    table_size = number_of_nodes * 4
+    if len(buffer) != HEADER_SIZE + 2 * number_of_landmarks * table_size:
+        raise ValueError(f"{preprocess_file_name} is truncated")
+
+    view = memoryview(buffer)
+    tables = [
+        view[start : start + table_size].cast("I")
+        for start in range(
+            HEADER_SIZE, HEADER_SIZE + 2 * number_of_landmarks * table_size, table_size
+        )
+    ]
+    return tables[:number_of_landmarks], tables[number_of_landmarks:]
+
+
+def load_preprocess_csv(
     preprocess_file_name: str,
     loading_bar: bool = False,
-) -> tuple[list[list[float | int]], list[list[float | int]]]:
+) -> tuple[Preprocess, Preprocess]:
     with open(preprocess_file_name, "r") as f:
         fields = f.readline().split()
         number_of_landmarks = int(fields[0])
         number_of_nodes = int(fields[1])
 
-        to_landmarks: list[list[int | float]] = cast(
-            list[list[int | float]], [list()[:] for _ in range(number_of_landmarks)]
-        )
-        from_landmarks: list[list[int | float]] = cast(
-            list[list[int | float]], [list()[:] for _ in range(number_of_landmarks)]
-        )
+        to_landmarks = [array("I") for _ in range(number_of_landmarks)]
+        from_landmarks = [array("I") for _ in range(number_of_landmarks)]
 
         if loading_bar:
             from tqdm import tqdm  # type: ignore
 
-            bar = tqdm(total=number_of_nodes, desc="Reading preprocess...")
+            bar = tqdm(total=number_of_nodes, desc="Reading preprocess csv...")
         else:
-            print("Reading preprocess...")
+            print("Reading preprocess csv...")
             bar = LoadingBarMocker()
 
         while line := f.readline():
             fields = line.split()
             for i, value in enumerate(
                 map(
-                    lambda field: float("inf") if field == "inf" else int(field),
+                    lambda field: UNREACHABLE if field == "inf" else int(field),
                     fields[:number_of_landmarks],
                 )
             ):
                 to_landmarks[i].append(value)
             for i, value in enumerate(
                 map(
-                    lambda field: float("inf") if field == "inf" else int(field),
+                    lambda field: UNREACHABLE if field == "inf" else int(field),
                     fields[number_of_landmarks:],
                 )
             ):
@@ -126,6 +244,15 @@ def load_preprocess(
     return to_landmarks, from_landmarks
 
 
+def convert_preprocess(
+    csv_file_name: str,
+    preprocess_file_name: str,
+    loading_bar: bool = False,
+):
+    to_landmarks, from_landmarks = load_preprocess_csv(csv_file_name, loading_bar)
+    write_landmark_tables(to_landmarks, from_landmarks, preprocess_file_name)
+
+
 def preprocess_and_save(
     node_file: str,
     edges_file: str,
@@ -133,8 +260,12 @@ def preprocess_and_save(
     preprocess_file: str,
     landmarks: dict[int, str],
     loading_bar: bool,
+    workers: int = 1,
+    queue: str = "heap",
 ) -> PathFinder:
-    pathfinder = preprocess(node_file, edges_file, place_file, landmarks, loading_bar)
+    pathfinder = preprocess(
+        node_file, edges_file, place_file, landmarks, loading_bar, workers, queue
+    )
     return save_preprocess(pathfinder, preprocess_file)
 
 
@@ -145,32 +276,57 @@ if __name__ == "__main__":
             "island_noder.txt",
             "island_kanter.txt",
             "island_interessepkt.txt",
-            "island_preprocess.csv",
+            "island_preprocess.landmarks",
         ),
         "skandinavia": (
             "noder.txt",
             "kanter.txt",
             "interessepkt.txt",
-            "preprocess.csv",
+            "preprocess.landmarks",
         ),
     }
     landmarks = {"island": ICELAND_LANDMARKS, "skandinavia": SCANDINAVIA_LANDMARKS}
     loading_bar = False
+    workers = os.cpu_count() or 1
+    queue = "heap"
+
+    if len(sys.argv) == 4 and sys.argv[1] == "convert":
+        convert_preprocess(sys.argv[2], sys.argv[3], loading_bar)
+        sys.exit(0)
+
+    from landmark_selection import STRATEGIES, select_landmarks
 
     try:
         chosen_files = files[sys.argv[1]]
         chosen_landmarks = landmarks[sys.argv[1]]
+        strategy = sys.argv[2] if len(sys.argv) > 2 else None
+        assert strategy is None or strategy in STRATEGIES
+        k = int(sys.argv[3]) if len(sys.argv) > 3 else len(chosen_landmarks)
     except Exception:
         print("You must specify the map you want to process.")
-        print(f"Choices: ({','.join(files.keys())})")
+        print(
+            f"Choices: ({','.join(files.keys())}) [{'|'.join(STRATEGIES.keys())}] [k]"
+        )
+        print("Or convert an old preprocess csv: convert <csv file> <landmark file>")
         sys.exit(1)
 
+    if strategy is not None:
+        nodes, reverse_nodes = read_complete_bidirectional(
+            *chosen_files[:3], loading_bar=loading_bar
+        )
+        chosen_landmarks = select_landmarks(
+            PathFinder(nodes, loading_bar, reverse_nodes), k, strategy
+        )
+        del nodes, reverse_nodes
+
     pathfinder = preprocess_and_save(
         *chosen_files,
         landmarks=chosen_landmarks,
         loading_bar=loading_bar,
+        workers=workers,
+        queue=queue,
     )
 
     print("Reading file...")
-    load_result = load_preprocess("island_preprocess.csv", loading_bar)
-    assert pathfinder.to_landmarks, pathfinder.from_landmarks == load_result
+    load_result = load_preprocess(chosen_files[3])
+    assert (pathfinder.to_landmarks, pathfinder.from_landmarks) == load_result
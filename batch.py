@@ -0,0 +1,178 @@
+from alt_preprocess import load_preprocess
+from file_handling import read_complete
+from pathfinding import PathFinder
+from utils import LoadingBarMocker
+from collections import deque
+from itertools import islice
+from typing import Iterator, Optional
+from timeit import default_timer as timer
+import multiprocessing
+import os
+import sys
+
+# (origin, destination, distance, nodes in path, nodes evaluated)
+Result = tuple[int, int, float | int, int, int]
+
+# Search state of a batch worker process.
+worker_pathfinder: Optional[PathFinder] = None
+
+
+def read_od_pairs(file_name: str, number_of_nodes: int) -> Iterator[tuple[int, int]]:
+    # One "origin destination" pair of node numbers per line. Empty lines and
+    # lines starting with # are skipped. Lines that are not a pair of nodes
+    # of the graph are reported and skipped, so one bad line does not stop
+    # the batch.
+    with open(file_name, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            try:
+                origin, destination = int(fields[0]), int(fields[1])
+            except (IndexError, ValueError):
+                origin = destination = -1
+            if not (
+                0 <= origin < number_of_nodes and 0 <= destination < number_of_nodes
+            ):
+                print(f"Skipping line {line_number} of {file_name}: {line.strip()}")
+                continue
+            yield origin, destination
+
+
+def init_worker(node_file: str, edges_file: str, place_file: str, landmark_file: str):
+    # The graph cache and the landmark file are both mapped read only, so
+    # every worker shares the same pages instead of getting a copy.
+    global worker_pathfinder
+    worker_pathfinder = PathFinder(read_complete(node_file, edges_file, place_file))
+    worker_pathfinder.set_preprocess(*load_preprocess(landmark_file))
+
+
+def worker_run_alt(pair: tuple[int, int]) -> Result:
+    assert worker_pathfinder is not None
+    origin, destination = pair
+    (distance, path), stats = worker_pathfinder.run_alt(
+        origin, destination, loading_desc="", stats=True
+    )
+    return origin, destination, distance, len(path), stats.settled
+
+
+def worker_run_alt_chunk(pairs: list[tuple[int, int]]) -> list[Result]:
+    return list(map(worker_run_alt, pairs))
+
+
+def pool_results(
+    pool, pairs: Iterator[tuple[int, int]], workers: int, chunksize: int
+) -> Iterator[Result]:
+    # The pairs are sent to the pool chunksize at a time, with a bounded
+    # number of chunks in flight, so a large pairs file is never held in
+    # memory at once. Results come back in the order of the pairs.
+    pending: deque = deque()
+    for chunk in iter(lambda: list(islice(pairs, chunksize)), []):
+        pending.append(pool.apply_async(worker_run_alt_chunk, (chunk,)))
+        if len(pending) > 2 * workers:
+            yield from pending.popleft().get()
+    while pending:
+        yield from pending.popleft().get()
+
+
+def write_result(f, result: Result):
+    f.write(",".join(map(str, result)) + "\n")
+
+
+def run_batch(
+    node_file: str,
+    edges_file: str,
+    place_file: str,
+    landmark_file: str,
+    pairs_file: str,
+    output_file: str,
+    workers: int = 1,
+    chunksize: int = 64,
+    loading_bar: bool = False,
+) -> int:
+    # Runs ALT for every pair in pairs_file and streams the results to
+    # output_file as csv, in the order of the input. Returns the number of
+    # queries.
+
+    # Make sure the graph cache exists before the workers open it.
+    graph = read_complete(node_file, edges_file, place_file)
+    pairs = read_od_pairs(pairs_file, len(graph))
+
+    if loading_bar:
+        from tqdm import tqdm
+
+        bar = tqdm(desc="Running queries...", unit=" queries")
+    else:
+        print("Running queries...")
+        bar = LoadingBarMocker()
+
+    start = timer()
+    queries = 0
+    with open(output_file, "w") as f:
+        f.write("origin,destination,distance,nodes in path,nodes evaluated\n")
+        if workers > 1:
+            with multiprocessing.Pool(
+                workers,
+                initializer=init_worker,
+                initargs=(node_file, edges_file, place_file, landmark_file),
+            ) as pool:
+                for result in pool_results(pool, pairs, workers, chunksize):
+                    write_result(f, result)
+                    queries += 1
+                    bar.update(1)
+        else:
+            init_worker(node_file, edges_file, place_file, landmark_file)
+            for result in map(worker_run_alt, pairs):
+                write_result(f, result)
+                queries += 1
+                bar.update(1)
+    end = timer()
+    bar.close()
+
+    exec_time = end - start
+    throughput = f"{queries / exec_time:.1f}/s" if exec_time else "-"
+    print(f"""
+{"queries":>15} {queries:>20}
+{"workers":>15} {workers:>20}
+{"exec time":>15} {f"{exec_time:.2f}s":>20}
+{"throughput":>15} {throughput:>20}
+""")
+    return queries
+
+
+if __name__ == "__main__":
+    files = {
+        "island": (
+            "island_noder.txt",
+            "island_kanter.txt",
+            "island_interessepkt.txt",
+            "island_preprocess.landmarks",
+        ),
+        "skandinavia": (
+            "noder.txt",
+            "kanter.txt",
+            "interessepkt.txt",
+            "preprocess.landmarks",
+        ),
+    }
+    loading_bar = False
+
+    try:
+        chosen_files = files[sys.argv[1]]
+        pairs_file, output_file = sys.argv[2], sys.argv[3]
+        workers = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count() or 1
+    except Exception:
+        print("You must specify the map, a file of origin destination pairs and")
+        print("the file to write the results to.")
+        print(
+            f"Choices: ({','.join(files.keys())}) <pairs file> <output file> [workers]"
+        )
+        sys.exit(1)
+
+    run_batch(
+        *chosen_files,
+        pairs_file,
+        output_file,
+        workers=workers,
+        loading_bar=loading_bar,
+    )
@@ -0,0 +1,311 @@
+from alt_preprocess import load_preprocess
+from contraction import load_hierarchy
+from file_handling import read_complete_bidirectional
+from graph_cache import Stamp, source_stamp
+from pathfinding import INFINITY, PathFinder, SearchStats
+from timeit import default_timer as timer
+from typing import Any, Callable, Optional
+import json
+import os
+import platform
+import random
+import sys
+import tracemalloc
+
+Query = tuple[int, int]
+QuerySets = dict[str, list[Query]]
+# mode -> query set -> metric -> value
+Results = dict[str, dict[str, dict[str, Any]]]
+# Runs one query of a mode, and returns its result and stats.
+Run = Callable[[int, int], tuple[tuple[float | int, list], SearchStats]]
+
+# Run before the timed queries of every mode and query set, untimed.
+WARMUP = 3
+
+# Relative slowdown of a latency percentile that counts as a regression, if
+# it is also more than MIN_SLOWDOWN milliseconds. Sub millisecond queries are
+# too noisy to be held to the relative bound alone.
+TOLERANCE = 0.1
+MIN_SLOWDOWN = 0.5
+
+
+def percentile(values: list[float], p: float) -> float:
+    # Linear interpolation between the closest ranks, as numpy.percentile.
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def random_queries(number_of_nodes: int, count: int, seed: int) -> list[Query]:
+    generator = random.Random(seed)
+    return [
+        (generator.randrange(number_of_nodes), generator.randrange(number_of_nodes))
+        for _ in range(count)
+    ]
+
+
+def stratified_queries(pathfinder: PathFinder, count: int, seed: int) -> QuerySets:
+    # Queries by Dijkstra rank: the destination is the r-th node settled from
+    # the origin. With n nodes reachable from the origin, short queries have
+    # r below n^(1/3), medium below n^(2/3) and long up to n, so every set
+    # covers a third of the ranks on a log scale.
+    generator = random.Random(seed)
+    number_of_nodes = len(pathfinder.nodes)
+    query_sets: QuerySets = {"short": [], "medium": [], "long": []}
+    while len(query_sets["long"]) < count:
+        origin = generator.randrange(number_of_nodes)
+        settled, _ = pathfinder.reachable_within(origin, INFINITY, loading_desc="")
+        reachable = len(settled)
+        if reachable < 8:
+            continue
+        bounds = [
+            1,
+            round(reachable ** (1 / 3)),
+            round(reachable ** (2 / 3)),
+            reachable,
+        ]
+        for name, low, high in zip(query_sets, bounds, bounds[1:]):
+            query_sets[name].append((origin, settled[generator.randrange(low, high)]))
+    return query_sets
+
+
+def query_sets_for(
+    pathfinder: PathFinder, file_name: str, count: int, seed: int, stamp: Stamp
+) -> QuerySets:
+    # The stratified sets need a full Dijkstra per origin, so the sets are
+    # saved and reused while the seed, count and stamp of the map files are
+    # unchanged.
+    if os.path.exists(file_name):
+        with open(file_name, "r") as f:
+            saved = json.load(f)
+        if (
+            saved["seed"] == seed
+            and saved["count"] == count
+            and saved.get("stamp") == list(stamp)
+        ):
+            return {
+                name: [tuple(query) for query in queries]
+                for name, queries in saved["queries"].items()
+            }
+
+    print("Generating query sets...")
+    query_sets = {"random": random_queries(len(pathfinder.nodes), count, seed)}
+    query_sets.update(stratified_queries(pathfinder, count, seed))
+    with open(file_name, "w") as f:
+        json.dump(
+            {"seed": seed, "count": count, "stamp": stamp, "queries": query_sets}, f
+        )
+    return query_sets
+
+
+def modes(pathfinder: PathFinder, hierarchy: bool) -> dict[str, Run]:
+    # Every mode sets the queue of the pathfinder, as the radix modes share it.
+    def run(method: Callable, queue: str = "heap", **kwargs) -> Run:
+        def query(
+            origin: int, destination: int
+        ) -> tuple[tuple[float | int, list], SearchStats]:
+            pathfinder.queue = queue
+            return method(origin, destination, loading_desc="", stats=True, **kwargs)
+
+        return query
+
+    chosen = {
+        "dijkstra": run(pathfinder.run_dijkstra),
+        "dijkstra radix": run(pathfinder.run_dijkstra, queue="radix"),
+        "bidirectional dijkstra": run(pathfinder.run_bidirectional_dijkstra),
+        "alt": run(pathfinder.run_alt),
+        "alt radix": run(pathfinder.run_alt, queue="radix"),
+        "alt eager": run(pathfinder.run_alt, estimate_mode="eager"),
+        "bidirectional alt": run(pathfinder.run_bidirectional_alt),
+        "astar": run(pathfinder.run_astar),
+        "astar eager": run(pathfinder.run_astar, estimate_mode="eager"),
+    }
+    if hierarchy:
+        chosen["ch"] = run(pathfinder.run_ch)
+    return chosen
+
+
+def measure(
+    run: Run, queries: list[Query], warmup: int = WARMUP
+) -> tuple[dict[str, Any], list[float | int]]:
+    # Metrics of one mode on one query set, and the distances found.
+    for origin, destination in queries[:warmup]:
+        run(origin, destination)
+
+    latencies, distances = list(), list()
+    stats = SearchStats()
+    for origin, destination in queries:
+        start = timer()
+        (distance, _), query_stats = run(origin, destination)
+        latencies.append((timer() - start) * 1000)
+        distances.append(distance)
+        stats.add(query_stats)
+
+    # Tracing allocations slows the searches down, so memory is measured in
+    # a separate untimed pass.
+    peak_memory = list()
+    tracemalloc.start()
+    try:
+        for origin, destination in queries:
+            tracemalloc.reset_peak()
+            run(origin, destination)
+            peak_memory.append(tracemalloc.get_traced_memory()[1] / 1e6)
+    finally:
+        tracemalloc.stop()
+
+    metrics = {
+        "queries": len(queries),
+        "unreachable": sum(distance == INFINITY for distance in distances),
+        "p50 ms": percentile(latencies, 50),
+        "p95 ms": percentile(latencies, 95),
+        "p99 ms": percentile(latencies, 99),
+        "mean ms": sum(latencies) / len(latencies),
+        "mean settled": stats.settled / len(queries),
+        "mean relaxed edges": stats.relaxed_edges / len(queries),
+        "mean heap pushes": stats.heap_pushes / len(queries),
+        "mean stale pops": stats.stale_pops / len(queries),
+        "mean heuristic evaluations": stats.heuristic_evaluations / len(queries),
+        "peak memory MB": max(peak_memory),
+    }
+    return metrics, distances
+
+
+def run_benchmark(
+    pathfinder: PathFinder,
+    query_sets: QuerySets,
+    hierarchy: bool = False,
+    warmup: int = WARMUP,
+) -> Results:
+    # Every mode on every query set. The distances of each mode are checked
+    # against the first one, and differences are counted as mismatches.
+    results: Results = dict()
+    reference: dict[str, list[float | int]] = dict()
+    for mode, run in modes(pathfinder, hierarchy).items():
+        results[mode] = dict()
+        for name, queries in query_sets.items():
+            print(f"Benchmarking {mode} on {name} queries...")
+            metrics, distances = measure(run, queries, warmup)
+            expected = reference.setdefault(name, distances)
+            metrics["mismatches"] = sum(a != b for a, b in zip(distances, expected))
+            results[mode][name] = metrics
+    return results
+
+
+def compare(
+    results: Results, baseline: Results, tolerance: float = TOLERANCE
+) -> list[str]:
+    # Regressions against baseline: latency percentiles more than tolerance
+    # and MIN_SLOWDOWN slower, more settled nodes, or new mismatches. Modes
+    # and query sets that are not in both are skipped.
+    regressions = list()
+    for mode, query_sets in results.items():
+        for name, metrics in query_sets.items():
+            old = baseline.get(mode, {}).get(name)
+            if old is None:
+                continue
+            for metric in ("p50 ms", "p95 ms", "p99 ms"):
+                slowdown = metrics[metric] - old[metric]
+                if slowdown > old[metric] * tolerance and slowdown > MIN_SLOWDOWN:
+                    regressions.append(
+                        f"{mode}, {name}: {metric} {old[metric]:.2f} -> "
+                        f"{metrics[metric]:.2f}"
+                    )
+            for metric in ("mean settled", "mismatches"):
+                if metrics[metric] > old[metric]:
+                    regressions.append(
+                        f"{mode}, {name}: {metric} {old[metric]} -> {metrics[metric]}"
+                    )
+    return regressions
+
+
+def print_results(results: Results):
+    print(
+        f"\n{'mode':>24} {'queries':>8} {'p50 ms':>10} {'p95 ms':>10} "
+        f"{'p99 ms':>10} {'settled':>10} {'pushes':>10} {'peak MB':>8}"
+    )
+    for mode, query_sets in results.items():
+        for name, metrics in query_sets.items():
+            print(
+                f"{mode:>24} {name:>8} {metrics['p50 ms']:>10.2f} "
+                f"{metrics['p95 ms']:>10.2f} {metrics['p99 ms']:>10.2f} "
+                f"{metrics['mean settled']:>10.0f} "
+                f"{metrics['mean heap pushes']:>10.0f} "
+                f"{metrics['peak memory MB']:>8.1f}"
+            )
+
+
+def environment() -> dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+    }
+
+
+if __name__ == "__main__":
+    files = {
+        "island": (
+            "island_noder.txt",
+            "island_kanter.txt",
+            "island_interessepkt.txt",
+            "island_preprocess.landmarks",
+            "island_hierarchy.ch",
+            "island_queries.json",
+        ),
+        "skandinavia": (
+            "noder.txt",
+            "kanter.txt",
+            "interessepkt.txt",
+            "preprocess.landmarks",
+            "hierarchy.ch",
+            "queries.json",
+        ),
+    }
+    loading_bar = False
+    seed = 2023
+
+    try:
+        chosen_files = files[sys.argv[1]]
+        output_file = sys.argv[2]
+        baseline_file: Optional[str] = sys.argv[3] if len(sys.argv) > 3 else None
+        count = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+    except Exception:
+        print("You must specify the map and the file to write the results to.")
+        print(
+            f"Choices: ({','.join(files.keys())}) <output file> [baseline file] "
+            "[queries per set]"
+        )
+        sys.exit(1)
+
+    nodes, reverse_nodes = read_complete_bidirectional(
+        *chosen_files[:3], loading_bar=loading_bar
+    )
+    pathfinder = PathFinder(nodes, loading_bar, reverse_nodes)
+    pathfinder.set_preprocess(*load_preprocess(chosen_files[3]))
+    hierarchy = os.path.exists(chosen_files[4])
+    if hierarchy:
+        pathfinder.set_hierarchy(load_hierarchy(chosen_files[4]))
+
+    stamp = source_stamp(*chosen_files[:2])
+    query_sets = query_sets_for(pathfinder, chosen_files[5], count, seed, stamp)
+    results = run_benchmark(pathfinder, query_sets, hierarchy)
+    print_results(results)
+    with open(output_file, "w") as f:
+        json.dump(
+            {"map": sys.argv[1], "environment": environment(), "results": results},
+            f,
+            indent=2,
+        )
+    print(f"Saved results to {output_file}")
+
+    if baseline_file is not None:
+        with open(baseline_file, "r") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {baseline_file}")
@@ -0,0 +1,95 @@
+from array import array
+from graph import Graph
+from utils import Preprocess, UNREACHABLE
+import re
+
+# Bit of each place type in Graph.types, as read from the interessepkt file.
+# Categories are combined with |, so charging | gas matches either.
+PLACENAME = 1
+GAS_STATION = 2
+CHARGING_STATION = 4
+EATING_PLACE = 8
+DRINKING_PLACE = 16
+SLEEPING_PLACE = 32
+
+CATEGORIES = {
+    "placename": PLACENAME,
+    "gas": GAS_STATION,
+    "charging": CHARGING_STATION,
+    "eating": EATING_PLACE,
+    "drinking": DRINKING_PLACE,
+    "sleeping": SLEEPING_PLACE,
+}
+
+# (distance table, bound of the category in it) per landmark.
+CategoryTerms = list[tuple[array | memoryview, int]]
+
+
+def category_mask(names: str) -> int:
+    # "charging,gas" -> CHARGING_STATION | GAS_STATION
+    mask = 0
+    for name in names.split(","):
+        try:
+            mask |= CATEGORIES[name.strip()]
+        except KeyError:
+            raise ValueError(
+                f"Unknown category {name}, choices: {', '.join(CATEGORIES)}"
+            )
+    return mask
+
+
+class CategoryIndex:
+    # The nodes of every place type bit, found with one scan over the types.
+    nodes_by_bit: dict[int, array]
+
+    def __init__(self, graph: Graph) -> None:
+        self.nodes_by_bit = dict()
+        # Only a small part of the nodes are places, so the scan for non zero
+        # types runs in the regex engine instead of a Python loop.
+        for match in re.finditer(b"[^\0]", graph.types):
+            node = match.start()
+            node_type = graph.types[node]
+            bit = 1
+            while bit <= node_type:
+                if node_type & bit:
+                    self.nodes_by_bit.setdefault(bit, array("i")).append(node)
+                bit <<= 1
+
+    def nodes(self, mask: int) -> list[int]:
+        # Sorted nodes with at least one of the bits in mask.
+        found: set[int] = set()
+        for bit, nodes in self.nodes_by_bit.items():
+            if bit & mask:
+                found.update(nodes)
+        return sorted(found)
+
+    def count(self, mask: int) -> int:
+        bits = [bit for bit in self.nodes_by_bit if bit & mask]
+        if len(bits) == 1:
+            return len(self.nodes_by_bit[bits[0]])
+        return len(self.nodes(mask))
+
+
+def category_terms(
+    nodes: list[int], from_landmarks: Preprocess, to_landmarks: Preprocess
+) -> tuple[CategoryTerms, CategoryTerms]:
+    # Landmark terms for a lower bound on the distance from a node to the
+    # closest of nodes. For every landmark L and place p,
+    #   d(v, p) >= d(L, p) - d(L, v) >= min_p d(L, p) - d(L, v)
+    #   d(v, p) >= d(v, L) - d(p, L) >= d(v, L) - max_p d(p, L)
+    # Both are 0 or less at the places themselves, so places are settled at
+    # their exact distance, in order. They have the form of the terms of
+    # landmark_estimate, with the bound in place of the destination distance.
+    from_terms: CategoryTerms = list()
+    for from_landmark in from_landmarks:
+        reachable = [
+            from_landmark[node] for node in nodes if from_landmark[node] != UNREACHABLE
+        ]
+        if reachable:
+            from_terms.append((from_landmark, min(reachable)))
+    to_terms: CategoryTerms = list()
+    for to_landmark in to_landmarks:
+        distances = [to_landmark[node] for node in nodes]
+        if distances and UNREACHABLE not in distances:
+            to_terms.append((to_landmark, max(distances)))
+    return from_terms, to_terms
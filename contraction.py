@@ -0,0 +1,363 @@
+from array import array
+from heapq import heapify, heappop, heappush
+from graph import Graph, zeros
+from graph_cache import padding, write_section
+from utils import LoadingBarMocker
+import mmap
+import struct
+import sys
+
+MAGIC = b"PFCHIER\0"
+VERSION = 1
+HEADER = struct.Struct("=8sIIqqq")
+HEADER_SIZE = 64
+
+NO_MIDDLE = -1
+
+# node -> {neighbour: (weight, middle node of the shortcut or NO_MIDDLE)}
+Adjacency = list[dict[int, tuple[int, int]]]
+
+
+class ContractionHierarchy:
+    # rank[v] is the position of v in the contraction order. The upward edges
+    # of v are the edges v -> x of the contracted graph with rank[x] > rank[v].
+    # The downward edges of v are the edges u -> v with rank[u] > rank[v],
+    # stored at v with u as target, so both searches of a query only go up.
+    rank: array
+    up_offsets: array
+    up_targets: array
+    up_weights: array
+    up_middles: array
+    down_offsets: array
+    down_targets: array
+    down_weights: array
+    down_middles: array
+
+    def __init__(
+        self,
+        rank: array,
+        up: tuple[array, array, array, array],
+        down: tuple[array, array, array, array],
+    ) -> None:
+        self.rank = rank
+        self.up_offsets, self.up_targets, self.up_weights, self.up_middles = up
+        (
+            self.down_offsets,
+            self.down_targets,
+            self.down_weights,
+            self.down_middles,
+        ) = down
+
+    def __len__(self) -> int:
+        return len(self.rank)
+
+    def middle(self, source: int, target: int) -> int:
+        if self.rank[source] < self.rank[target]:
+            node, other = source, target
+            offsets, targets, middles = (
+                self.up_offsets,
+                self.up_targets,
+                self.up_middles,
+            )
+        else:
+            node, other = target, source
+            offsets, targets, middles = (
+                self.down_offsets,
+                self.down_targets,
+                self.down_middles,
+            )
+        for edge in range(offsets[node], offsets[node + 1]):
+            if targets[edge] == other:
+                return middles[edge]
+        raise KeyError(f"No edge from {source} to {target} in the hierarchy")
+
+    def unpack(self, source: int, target: int) -> list[int]:
+        # The original nodes after source on the path the edge
+        # source -> target stands for, ending with target.
+        path: list[int] = list()
+        stack = [(source, target)]
+        while stack:
+            source, target = stack.pop()
+            middle = self.middle(source, target)
+            if middle == NO_MIDDLE:
+                path.append(target)
+            else:
+                stack.append((middle, target))
+                stack.append((source, middle))
+        return path
+
+
+def adjacency(graph: Graph) -> tuple[Adjacency, Adjacency]:
+    out_edges: Adjacency = [dict() for _ in range(len(graph))]
+    in_edges: Adjacency = [dict() for _ in range(len(graph))]
+    for source in range(len(graph)):
+        for edge in range(graph.offsets[source], graph.offsets[source + 1]):
+            target, weight = graph.targets[edge], graph.weights[edge]
+            if target == source:
+                continue
+            if target not in out_edges[source] or weight < out_edges[source][target][0]:
+                out_edges[source][target] = (weight, NO_MIDDLE)
+                in_edges[target][source] = (weight, NO_MIDDLE)
+    return out_edges, in_edges
+
+
+def witness_distances(
+    out_edges: Adjacency,
+    source: int,
+    excluded: int,
+    targets: dict[int, tuple[int, int]],
+    max_distance: int,
+    settle_limit: int,
+) -> dict[int, int]:
+    # Bounded Dijkstra from source that avoids excluded, and stops once every
+    # node in targets is settled. Tentative distances are returned too, as each
+    # of them is the length of a real path.
+    distances = {source: 0}
+    heap = [(0, source)]
+    settled = 0
+    targets_left = len(targets) - (source in targets)
+    while heap:
+        distance, node = heappop(heap)
+        if distance > distances[node]:
+            continue
+        if distance > max_distance or settled == settle_limit:
+            break
+        if node in targets and node != source:
+            targets_left -= 1
+            if not targets_left:
+                break
+        settled += 1
+        for target, (weight, _) in out_edges[node].items():
+            if target == excluded:
+                continue
+            target_distance = distance + weight
+            if target_distance < distances.get(target, target_distance + 1):
+                distances[target] = target_distance
+                heappush(heap, (target_distance, target))
+    return distances
+
+
+def shortcuts(
+    out_edges: Adjacency, in_edges: Adjacency, node: int, settle_limit: int
+) -> list[tuple[int, int, int]]:
+    # The (source, target, weight) shortcuts needed to remove node without
+    # changing any distance between the remaining nodes.
+    needed: list[tuple[int, int, int]] = list()
+    targets = out_edges[node]
+    if not targets:
+        return needed
+    max_out_weight = max(weight for weight, _ in targets.values())
+    for source, (in_weight, _) in in_edges[node].items():
+        distances = witness_distances(
+            out_edges,
+            source,
+            node,
+            targets,
+            in_weight + max_out_weight,
+            settle_limit,
+        )
+        for target, (out_weight, _) in targets.items():
+            if target == source:
+                continue
+            weight = in_weight + out_weight
+            if distances.get(target, weight + 1) > weight:
+                needed.append((source, target, weight))
+    return needed
+
+
+def priority(
+    out_edges: Adjacency,
+    in_edges: Adjacency,
+    deleted_neighbours: array,
+    node: int,
+    settle_limit: int,
+) -> tuple[int, list[tuple[int, int, int]]]:
+    # Edge difference plus the number of contracted neighbours, which spreads
+    # the contraction evenly over the graph. The shortcuts are returned so
+    # they need not be searched for again when the node is contracted.
+    node_shortcuts = shortcuts(out_edges, in_edges, node, settle_limit)
+    edge_difference = len(node_shortcuts) - len(out_edges[node]) - len(in_edges[node])
+    return edge_difference + deleted_neighbours[node], node_shortcuts
+
+
+def csr(edges: list[list[tuple[int, int, int]]]) -> tuple[array, array, array, array]:
+    offsets = array("q", [0])
+    targets, weights, middles = array("i"), array("i"), array("i")
+    for node_edges in edges:
+        for target, weight, middle in node_edges:
+            targets.append(target)
+            weights.append(weight)
+            middles.append(middle)
+        offsets.append(len(targets))
+    return offsets, targets, weights, middles
+
+
+def contract(
+    graph: Graph,
+    settle_limit: int = 100,
+    loading_bar: bool = False,
+) -> ContractionHierarchy:
+    out_edges, in_edges = adjacency(graph)
+    number_of_nodes = len(graph)
+    deleted_neighbours = zeros("i", number_of_nodes)
+
+    print("Ordering nodes...")
+    queue = [
+        (
+            priority(out_edges, in_edges, deleted_neighbours, node, settle_limit)[0],
+            node,
+        )
+        for node in range(number_of_nodes)
+    ]
+    heapify(queue)
+
+    if loading_bar:
+        from tqdm import tqdm  # type: ignore
+
+        bar = tqdm(total=number_of_nodes, desc="Contracting nodes...")
+    else:
+        print("Contracting nodes...")
+        bar = LoadingBarMocker()
+
+    rank = zeros("i", number_of_nodes)
+    contracted = bytearray(number_of_nodes)
+    up: list[list[tuple[int, int, int]]] = [list() for _ in range(number_of_nodes)]
+    down: list[list[tuple[int, int, int]]] = [list() for _ in range(number_of_nodes)]
+    next_rank = 0
+    while queue:
+        _, node = heappop(queue)
+        if contracted[node]:
+            continue
+
+        # Lazy update: priorities go stale as neighbours are contracted, so
+        # recompute before contracting and requeue if no longer the smallest.
+        current_priority, node_shortcuts = priority(
+            out_edges, in_edges, deleted_neighbours, node, settle_limit
+        )
+        if queue and current_priority > queue[0][0]:
+            heappush(queue, (current_priority, node))
+            continue
+
+        for source, target, weight in node_shortcuts:
+            if target in out_edges[source] and out_edges[source][target][0] <= weight:
+                continue
+            out_edges[source][target] = (weight, node)
+            in_edges[target][source] = (weight, node)
+
+        up[node] = [
+            (target, weight, middle)
+            for target, (weight, middle) in out_edges[node].items()
+        ]
+        down[node] = [
+            (source, weight, middle)
+            for source, (weight, middle) in in_edges[node].items()
+        ]
+        for target in out_edges[node]:
+            del in_edges[target][node]
+            deleted_neighbours[target] += 1
+        for source in in_edges[node]:
+            del out_edges[source][node]
+            deleted_neighbours[source] += 1
+        out_edges[node] = dict()
+        in_edges[node] = dict()
+
+        contracted[node] = 1
+        rank[node] = next_rank
+        next_rank += 1
+        bar.update(1)
+
+    bar.close()
+    return ContractionHierarchy(rank, csr(up), csr(down))
+
+
+def save_hierarchy(hierarchy: ContractionHierarchy, file_name: str):
+    with open(file_name, "wb") as f:
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                0,
+                len(hierarchy),
+                len(hierarchy.up_targets),
+                len(hierarchy.down_targets),
+            ).ljust(HEADER_SIZE, b"\0")
+        )
+        for data in (
+            hierarchy.rank,
+            hierarchy.up_offsets,
+            hierarchy.up_targets,
+            hierarchy.up_weights,
+            hierarchy.up_middles,
+            hierarchy.down_offsets,
+            hierarchy.down_targets,
+            hierarchy.down_weights,
+            hierarchy.down_middles,
+        ):
+            write_section(f, data)
+
+
+def load_hierarchy(file_name: str) -> ContractionHierarchy:
+    print("Reading contraction hierarchy...")
+    with open(file_name, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, _, number_of_nodes, up_edges, down_edges = HEADER.unpack_from(
+        buffer
+    )
+    if magic != MAGIC:
+        raise ValueError(f"{file_name} is not a contraction hierarchy file")
+    if version != VERSION:
+        raise ValueError(f"Unsupported contraction hierarchy version {version}")
+
+    view = memoryview(buffer)
+    position = HEADER_SIZE
+    sections: list[memoryview] = list()
+    for typecode, length in (
+        ("i", number_of_nodes),
+        ("q", number_of_nodes + 1),
+        ("i", up_edges),
+        ("i", up_edges),
+        ("i", up_edges),
+        ("q", number_of_nodes + 1),
+        ("i", down_edges),
+        ("i", down_edges),
+        ("i", down_edges),
+    ):
+        size = length * array(typecode).itemsize
+        if position + size > len(buffer):
+            raise ValueError(f"{file_name} is truncated")
+        sections.append(view[position : position + size].cast(typecode))
+        position += size + padding(size)
+
+    return ContractionHierarchy(sections[0], tuple(sections[1:5]), tuple(sections[5:9]))
+
+
+if __name__ == "__main__":
+    from file_handling import read_complete
+
+    files = {
+        "island": (
+            "island_noder.txt",
+            "island_kanter.txt",
+            "island_interessepkt.txt",
+            "island_hierarchy.ch",
+        ),
+        "skandinavia": (
+            "noder.txt",
+            "kanter.txt",
+            "interessepkt.txt",
+            "hierarchy.ch",
+        ),
+    }
+    loading_bar = False
+
+    try:
+        chosen_files = files[sys.argv[1]]
+    except Exception:
+        print("You must specify the map you want to contract.")
+        print(f"Choices: ({','.join(files.keys())})")
+        sys.exit(1)
+
+    graph = read_complete(*chosen_files[:3], loading_bar=loading_bar)
+    hierarchy = contract(graph, loading_bar=loading_bar)
+    save_hierarchy(hierarchy, chosen_files[3])
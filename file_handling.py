@@ -1,40 +1,60 @@
-from utils import Node
+from array import array
+from collections import deque
+from graph import Graph
+from timeit import default_timer as timer
+from typing import BinaryIO, Callable, Iterator, Optional
+from utils import LoadingBarMocker
 import gc
+import graph_cache
+import multiprocessing
+import os
+import warnings
 
+# Bytes read at a time by the chunked parser, before extending the chunk to
+# the end of its last line.
+CHUNK_SIZE = 1 << 24
 
-def read_nodes(file_name: str, loading_bar: bool = False) -> list[Node]:
+
+def read_nodes(file_name: str, loading_bar: bool = False) -> Graph:
     if loading_bar:
         from tqdm import tqdm  # type: ignore
-    nodes: list[Node] = list()
+    latitudes = array("d")
+    longitudes = array("d")
 
     gc.disable()
     with open(file_name, "r") as f:
         number_of_nodes = int(f.readline().strip())
-        i = 0
         if loading_bar:
             with tqdm(total=number_of_nodes, desc="Reading nodes...") as bar:
                 while line := f.readline():
                     fields = line.split()
-                    nodes.append(Node(i, list(), (float(fields[1]), float(fields[2]))))
-                    i += 1
+                    if not fields:
+                        continue
+                    latitudes.append(float(fields[1]))
+                    longitudes.append(float(fields[2]))
                     bar.update(1)
         else:
             print("Reading nodes...")
             while line := f.readline():
                 fields = line.split()
-                nodes.append(Node(i, list(), (float(fields[1]), float(fields[2]))))
-                i += 1
+                if not fields:
+                    continue
+                latitudes.append(float(fields[1]))
+                longitudes.append(float(fields[2]))
     gc.enable()
 
-    assert number_of_nodes == len(nodes)
-    return nodes
+    assert number_of_nodes == len(latitudes)
+    return Graph(latitudes, longitudes)
 
 
-def read_edges(
-    file_name: str, nodes: list[Node], reverse: bool = False, loading_bar: bool = False
-) -> list[Node]:
+def parse_edges(
+    file_name: str, loading_bar: bool = False
+) -> tuple[array, array, array]:
     if loading_bar:
         from tqdm import tqdm
+    sources = array("i")
+    targets = array("i")
+    weights = array("i")
 
     gc.disable()
     with open(file_name, "r") as f:
@@ -43,30 +63,38 @@ def read_edges(
             with tqdm(total=entries, desc="Reading edges...") as bar:
                 while line := f.readline():
                     fields = line.split()
-                    values = tuple(map(int, fields[:3]))
-                    if reverse:
-                        nodes[values[1]].edges.append((values[0], values[2]))
-                    else:
-                        nodes[values[0]].edges.append((values[1], values[2]))
+                    if not fields:
+                        continue
+                    sources.append(int(fields[0]))
+                    targets.append(int(fields[1]))
+                    weights.append(int(fields[2]))
                     bar.update(1)
 
         else:
             print("Reading edges...")
             while line := f.readline():
                 fields = line.split()
-                values = tuple(map(int, fields[:3]))
-                if reverse:
-                    nodes[values[1]].edges.append((values[0], values[2]))
-                else:
-                    nodes[values[0]].edges.append((values[1], values[2]))
+                if not fields:
+                    continue
+                sources.append(int(fields[0]))
+                targets.append(int(fields[1]))
+                weights.append(int(fields[2]))
     gc.enable()
 
-    return nodes
+    return sources, targets, weights
 
 
-def read_place(
-    file_name: str, nodes: list[Node], loading_bar: bool = False
-) -> list[Node]:
+def read_edges(
+    file_name: str, graph: Graph, reverse: bool = False, loading_bar: bool = False
+) -> Graph:
+    sources, targets, weights = parse_edges(file_name, loading_bar=loading_bar)
+    if reverse:
+        sources, targets = targets, sources
+    graph.set_edges(sources, targets, weights)
+    return graph
+
+
+def read_place(file_name: str, graph: Graph, loading_bar: bool = False) -> Graph:
     if loading_bar:
         from tqdm import tqdm
 
@@ -77,22 +105,225 @@ def read_place(
             with tqdm(total=entries, desc="Reading place types...") as bar:
                 while line := f.readline():
                     fields = line.split()
+                    if not fields:
+                        continue
                     int_fields = tuple(map(int, fields[:2]))
                     name = fields[-1][1:-1]
-                    nodes[int_fields[0]].type = int_fields[1]
-                    nodes[int_fields[0]].name = name
+                    graph.types[int_fields[0]] = int_fields[1]
+                    graph.names[int_fields[0]] = name
                     bar.update(1)
         else:
             print("Reading place types...")
             while line := f.readline():
                 fields = line.split()
+                if not fields:
+                    continue
                 int_fields = tuple(map(int, fields[:2]))
                 name = fields[-1][1:-1]
-                nodes[int_fields[0]].type = int_fields[1]
-                nodes[int_fields[0]].name = name
+                graph.types[int_fields[0]] = int_fields[1]
+                graph.names[int_fields[0]] = name
     gc.enable()
 
-    return nodes
+    return graph
+
+
+def read_chunks(f: BinaryIO, bar) -> Iterator[bytes]:
+    # The rest of f in chunks of whole lines.
+    while chunk := f.read(CHUNK_SIZE):
+        chunk += f.readline()
+        bar.update(len(chunk))
+        yield chunk
+
+
+def peek_fields(f: BinaryIO) -> int:
+    # The number of fields on the next line, without consuming it.
+    position = f.tell()
+    fields = len(f.readline().split())
+    f.seek(position)
+    return fields
+
+
+def map_chunks(
+    f: BinaryIO,
+    description: str,
+    function: Callable,
+    arguments: tuple,
+    workers: Optional[int] = None,
+    loading_bar: bool = False,
+) -> Iterator:
+    # function(chunk, *arguments) for the chunks of the rest of f, in order.
+    # With more than one worker the chunks are parsed in a process pool, with
+    # a bounded number of chunks in flight so the file is never held in
+    # memory at once. Reports how fast the file was parsed when done.
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # Pool workers are daemonic and can not have children of their own.
+    if multiprocessing.current_process().daemon:
+        workers = 1
+
+    if loading_bar:
+        from tqdm import tqdm
+
+        bar = tqdm(
+            total=os.fstat(f.fileno()).st_size - f.tell(),
+            desc=description,
+            unit="B",
+            unit_scale=True,
+        )
+    else:
+        print(description)
+        bar = LoadingBarMocker()
+
+    start, start_position = timer(), f.tell()
+    chunks = read_chunks(f, bar)
+    if workers == 1:
+        for chunk in chunks:
+            yield function(chunk, *arguments)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            pending: deque = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(function, (chunk, *arguments)))
+                if len(pending) > 2 * workers:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+    bar.close()
+
+    megabytes = (f.tell() - start_position) / 1e6
+    exec_time = timer() - start
+    speed = f"{megabytes / exec_time:.1f} MB/s" if exec_time else "-"
+    print(f"Parsed {megabytes:.1f} MB of {f.name} at {speed}")
+
+
+def parse_number_chunk(
+    chunk: bytes, typecode: str, fields: int, columns: tuple[int, ...]
+) -> list[array]:
+    # The given columns of a chunk of lines with fields numbers each. NumPy
+    # tokenizes the chunk in C when it is installed. It stops quietly at the
+    # first bad value, so the number of values is checked against the lines.
+    # Blank lines are only counted out when the check fails, as they are rare.
+    try:
+        import numpy as np  # type: ignore
+    except ImportError:
+        np = None
+
+    if np is not None:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            values = np.fromstring(chunk, dtype=np.dtype(typecode), sep=" ")
+        lines = chunk.count(b"\n") + (not chunk.endswith(b"\n"))
+        if len(values) != lines * fields:
+            lines = sum(1 for line in chunk.splitlines() if line.strip())
+        if len(values) != lines * fields:
+            raise ValueError(f"Lines without {fields} numbers")
+        return [array(typecode, values[column::fields].tobytes()) for column in columns]
+
+    convert = float if typecode == "d" else int
+    values = array(typecode, map(convert, chunk.split()))
+    if len(values) % fields:
+        raise ValueError(f"Lines without {fields} numbers")
+    return [values[column::fields] for column in columns]
+
+
+def parse_place_chunk(chunk: bytes) -> tuple[array, array, list[str]]:
+    nodes, types, names = array("i"), array("B"), list()
+    for line in chunk.splitlines():
+        fields = line.split()
+        if not fields:
+            continue
+        nodes.append(int(fields[0]))
+        types.append(int(fields[1]))
+        names.append(fields[-1][1:-1].decode())
+    return nodes, types, names
+
+
+def read_nodes_chunked(
+    file_name: str, workers: Optional[int] = None, loading_bar: bool = False
+) -> Graph:
+    latitudes = array("d")
+    longitudes = array("d")
+    with open(file_name, "rb") as f:
+        number_of_nodes = int(f.readline())
+        for chunk_latitudes, chunk_longitudes in map_chunks(
+            f,
+            "Reading nodes...",
+            parse_number_chunk,
+            ("d", peek_fields(f), (1, 2)),
+            workers,
+            loading_bar,
+        ):
+            latitudes.extend(chunk_latitudes)
+            longitudes.extend(chunk_longitudes)
+
+    if number_of_nodes != len(latitudes):
+        raise ValueError(f"{file_name} does not have {number_of_nodes} nodes")
+    return Graph(latitudes, longitudes)
+
+
+def parse_edges_chunked(
+    file_name: str, workers: Optional[int] = None, loading_bar: bool = False
+) -> tuple[array, array, array]:
+    sources = array("i")
+    targets = array("i")
+    weights = array("i")
+    with open(file_name, "rb") as f:
+        f.readline()
+        for chunk_sources, chunk_targets, chunk_weights in map_chunks(
+            f,
+            "Reading edges...",
+            parse_number_chunk,
+            ("i", peek_fields(f), (0, 1, 2)),
+            workers,
+            loading_bar,
+        ):
+            sources.extend(chunk_sources)
+            targets.extend(chunk_targets)
+            weights.extend(chunk_weights)
+
+    return sources, targets, weights
+
+
+def read_place_chunked(
+    file_name: str,
+    graph: Graph,
+    workers: Optional[int] = None,
+    loading_bar: bool = False,
+) -> Graph:
+    with open(file_name, "rb") as f:
+        f.readline()
+        for nodes, types, names in map_chunks(
+            f, "Reading place types...", parse_place_chunk, (), workers, loading_bar
+        ):
+            for node, node_type, name in zip(nodes, types, names):
+                graph.types[node] = node_type
+                graph.names[node] = name
+
+    return graph
+
+
+def parse_files(
+    node_file: str,
+    edges_file: str,
+    place_file: str,
+    loading_bar: bool = False,
+    workers: Optional[int] = None,
+    chunked: bool = True,
+) -> tuple[Graph, array, array, array]:
+    # The nodes with their place types, and the edge lists. The files are
+    # parsed in chunks over workers processes, or line by line when chunked
+    # is off or a file has lines the chunked parser does not handle.
+    if chunked:
+        try:
+            graph = read_nodes_chunked(node_file, workers, loading_bar)
+            graph = read_place_chunked(place_file, graph, workers, loading_bar)
+            return graph, *parse_edges_chunked(edges_file, workers, loading_bar)
+        except ValueError as e:
+            print(f"Chunked parsing failed ({e}), reading line by line")
+
+    graph = read_nodes(node_file, loading_bar=loading_bar)
+    graph = read_place(place_file, graph, loading_bar=loading_bar)
+    return graph, *parse_edges(edges_file, loading_bar=loading_bar)
 
 
 def read_complete(
@@ -101,7 +332,74 @@ def read_complete(
     place_file: str,
     reverse: bool = False,
     loading_bar: bool = False,
-) -> list[Node]:
-    nodes = read_nodes(node_file, loading_bar=loading_bar)
-    nodes = read_edges(edges_file, nodes, reverse=reverse, loading_bar=loading_bar)
-    return read_place(place_file, nodes, loading_bar=loading_bar)
+    use_cache: bool = True,
+    workers: Optional[int] = None,
+    chunked: bool = True,
+) -> Graph:
+    if use_cache:
+        cache_file = graph_cache.cache_file_name(node_file, reverse)
+        stamp = graph_cache.source_stamp(node_file, edges_file, place_file)
+        graph = graph_cache.load_graph(cache_file, stamp, reverse)
+        if graph is not None:
+            print(f"Read graph from {cache_file}")
+            return graph
+
+    graph, sources, targets, weights = parse_files(
+        node_file, edges_file, place_file, loading_bar, workers, chunked
+    )
+    if reverse:
+        sources, targets = targets, sources
+    start = timer()
+    graph.set_edges(sources, targets, weights)
+    print(f"Merged {len(weights)} edges into the graph in {timer() - start:.2f} s")
+    del sources, targets, weights
+
+    if use_cache:
+        print(f"Writing graph cache to {cache_file}...")
+        graph_cache.save_graph(graph, cache_file, stamp, reverse)
+    return graph
+
+
+def read_complete_bidirectional(
+    node_file: str,
+    edges_file: str,
+    place_file: str,
+    loading_bar: bool = False,
+    use_cache: bool = True,
+    workers: Optional[int] = None,
+    chunked: bool = True,
+) -> tuple[Graph, Graph]:
+    # Builds the forward graph and its transpose from a single pass over the
+    # files. The two graphs share the node coordinates, types and names.
+    if use_cache:
+        stamp = graph_cache.source_stamp(node_file, edges_file, place_file)
+        cache_files = [
+            graph_cache.cache_file_name(node_file, reverse) for reverse in (False, True)
+        ]
+        graphs = [
+            graph_cache.load_graph(cache_file, stamp, reverse)
+            for cache_file, reverse in zip(cache_files, (False, True))
+        ]
+        if graphs[0] is not None and graphs[1] is not None:
+            print(f"Read graphs from {cache_files[0]} and {cache_files[1]}")
+            return graphs[0], graphs[1]
+
+    graph, sources, targets, weights = parse_files(
+        node_file, edges_file, place_file, loading_bar, workers, chunked
+    )
+    reverse_graph = Graph(
+        graph.latitudes, graph.longitudes, types=graph.types, names=graph.names
+    )
+    start = timer()
+    graph.set_edges(sources, targets, weights)
+    reverse_graph.set_edges(targets, sources, weights)
+    print(f"Merged {len(weights)} edges into both graphs in {timer() - start:.2f} s")
+    del sources, targets, weights
+
+    if use_cache:
+        for cache_file, reverse, cached_graph in zip(
+            cache_files, (False, True), (graph, reverse_graph)
+        ):
+            print(f"Writing graph cache to {cache_file}...")
+            graph_cache.save_graph(cached_graph, cache_file, stamp, reverse)
+    return graph, reverse_graph
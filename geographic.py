@@ -0,0 +1,133 @@
+from array import array
+from graph import Buffer, Graph
+from math import asin, radians, sin, sqrt
+from typing import Callable
+
+# Mean radius of the earth in meters.
+EARTH_RADIUS = 6_371_000
+
+# The max speed is raised by this fraction, so that rounding in the distances
+# can not push an estimate above the true travel time.
+MARGIN = 1e-6
+
+# Edges handled per NumPy operation when finding the max speed.
+EDGE_CHUNK = 1 << 20
+
+# Nodes handled per NumPy operation when filling all estimates.
+NODE_CHUNK = 1 << 16
+
+
+class GeographicBound:
+    # Lower bound of the travel time between two nodes: the great-circle
+    # distance between them over the highest speed of any edge, in meters per
+    # centisecond. A path is at least as long as the great circle between its
+    # ends, and takes at least its length over the max speed, so the bound is
+    # admissible and consistent without any preprocessing. The speed is found
+    # once for the graph, and the coordinates in radians and the cosine of
+    # the latitude of every node are kept for the estimates. NumPy is imported
+    # when the bound is made.
+    latitudes: Buffer
+    longitudes: Buffer
+    cos_latitudes: memoryview
+    radians: tuple["numpy.ndarray", ...]  # type: ignore # noqa: F821
+    speed: float
+    centiseconds_per_meter: float
+
+    def __init__(self, graph: Graph) -> None:
+        import numpy as np  # type: ignore
+
+        self.np = np
+        self.latitudes = graph.latitudes
+        self.longitudes = graph.longitudes
+        latitudes = np.radians(np.asarray(graph.latitudes, dtype=np.float64))
+        longitudes = np.radians(np.asarray(graph.longitudes, dtype=np.float64))
+        cos_latitudes = np.cos(latitudes)
+        self.radians = (latitudes, longitudes, cos_latitudes)
+        self.cos_latitudes = memoryview(cos_latitudes)
+
+        offsets = np.asarray(graph.offsets, dtype=np.int64)
+        targets = np.asarray(graph.targets, dtype=np.int64)
+        weights = np.asarray(graph.weights, dtype=np.float64)
+        speed = 0.0
+        for start in range(0, len(targets), EDGE_CHUNK):
+            edges = np.arange(start, min(start + EDGE_CHUNK, len(targets)))
+            sources = np.searchsorted(offsets, edges, side="right") - 1
+            chunk_targets = targets[edges]
+            distances = self.vector_distances(
+                latitudes[sources],
+                longitudes[sources],
+                cos_latitudes[sources],
+                latitudes[chunk_targets],
+                longitudes[chunk_targets],
+                cos_latitudes[chunk_targets],
+            )
+            # An edge of no time that moves gives an infinite speed, and with
+            # it a bound of 0, which is all that can be said then.
+            with np.errstate(divide="ignore", invalid="ignore"):
+                speeds = np.where(distances > 0, distances / weights[edges], 0)
+            speed = max(speed, float(speeds.max()))
+        self.speed = speed
+
+        if 0 < speed < float("inf"):
+            self.centiseconds_per_meter = 1 / (speed * (1 + MARGIN))
+        else:
+            self.centiseconds_per_meter = 0.0
+
+    def vector_distances(
+        self,
+        latitudes,
+        longitudes,
+        cos_latitudes,
+        other_latitudes,
+        other_longitudes,
+        other_cos_latitudes,
+    ):
+        # Haversine distance in meters, on NumPy arrays of radians.
+        np = self.np
+        a = (
+            np.sin((other_latitudes - latitudes) / 2) ** 2
+            + cos_latitudes
+            * other_cos_latitudes
+            * np.sin((other_longitudes - longitudes) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS * np.arcsin(np.minimum(np.sqrt(a), 1))
+
+    def estimate(self, destination: int) -> Callable[[int], int]:
+        # Lower bound of the travel time from a node to destination, in
+        # centiseconds. Only the terms of the node are computed per call.
+        latitudes, longitudes = self.latitudes, self.longitudes
+        cos_latitudes = self.cos_latitudes
+        destination_latitude = latitudes[destination]
+        destination_longitude = longitudes[destination]
+        destination_cos = cos_latitudes[destination]
+        half_radian = radians(1) / 2
+        scale = 2 * EARTH_RADIUS * self.centiseconds_per_meter
+
+        def estimate(node: int) -> int:
+            a = (
+                sin((latitudes[node] - destination_latitude) * half_radian) ** 2
+                + cos_latitudes[node]
+                * destination_cos
+                * sin((longitudes[node] - destination_longitude) * half_radian) ** 2
+            )
+            return int(scale * asin(min(sqrt(a), 1)))
+
+        return estimate
+
+    def all_estimates(self, destination: int, estimates: array):
+        # Estimates for every node of the graph at once, written to the int64
+        # array estimates, a chunk of nodes at a time.
+        np = self.np
+        latitudes, longitudes, cos_latitudes = self.radians
+        out = np.frombuffer(estimates, dtype=np.int64)
+        for start in range(0, len(latitudes), NODE_CHUNK):
+            chunk = slice(start, start + NODE_CHUNK)
+            distances = self.vector_distances(
+                latitudes[chunk],
+                longitudes[chunk],
+                cos_latitudes[chunk],
+                latitudes[destination],
+                longitudes[destination],
+                cos_latitudes[destination],
+            )
+            out[chunk] = distances * self.centiseconds_per_meter
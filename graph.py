@@ -0,0 +1,180 @@
+from array import array
+from typing import Iterable, Iterator, Optional
+
+from utils import Node
+
+# Graph data is either built in memory as arrays, or memory mapped from a graph
+# cache file, in which case it is a read only memoryview.
+Buffer = array | memoryview
+
+
+def zeros(typecode: str, length: int) -> array:
+    return array(typecode, bytes(array(typecode).itemsize * length))
+
+
+class Graph:
+    # Compressed sparse row adjacency: the edges of node i are stored at
+    # targets[offsets[i]:offsets[i + 1]] and weights[offsets[i]:offsets[i + 1]].
+    offsets: Buffer
+    targets: Buffer
+    weights: Buffer
+    latitudes: Buffer
+    longitudes: Buffer
+    types: bytearray | memoryview
+    names: dict[int, str]
+
+    def __init__(
+        self,
+        latitudes: Buffer,
+        longitudes: Buffer,
+        offsets: Optional[Buffer] = None,
+        targets: Optional[Buffer] = None,
+        weights: Optional[Buffer] = None,
+        types: Optional[bytearray | memoryview] = None,
+        names: Optional[dict[int, str]] = None,
+    ) -> None:
+        assert len(latitudes) == len(longitudes)
+        number_of_nodes = len(latitudes)
+
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.offsets = (
+            offsets if offsets is not None else zeros("q", number_of_nodes + 1)
+        )
+        self.targets = targets if targets is not None else array("i")
+        self.weights = weights if weights is not None else array("i")
+        self.types = types if types is not None else bytearray(number_of_nodes)
+        self.names = names if names is not None else dict()
+
+        assert len(self.offsets) == number_of_nodes + 1
+        assert len(self.types) == number_of_nodes
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    def __getitem__(self, i: int) -> Node:
+        return Node(i, self.edges(i), self.pos(i), self.types[i], self.names.get(i))
+
+    def __iter__(self) -> Iterator[Node]:
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def number_of_edges(self) -> int:
+        return len(self.targets)
+
+    def pos(self, i: int) -> tuple[float, float]:
+        return self.latitudes[i], self.longitudes[i]
+
+    def edges(self, i: int) -> list[tuple[int, int]]:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return list(zip(self.targets[start:end], self.weights[start:end]))
+
+    def set_edges(
+        self, sources: Iterable[int], targets: Iterable[int], weights: Iterable[int]
+    ):
+        # Stable sort on the source, so the edges of each node keep the order
+        # they were given in. NumPy sorts them when it is installed, else a
+        # counting sort runs in Python.
+        try:
+            import numpy as np  # type: ignore
+        except ImportError:
+            np = None
+
+        if np is None:
+            self.offsets, self.targets, self.weights = counting_sort(
+                len(self), array("i", sources), array("i", targets), array("i", weights)
+            )
+            return
+
+        sources, targets, weights = (
+            np.asarray(
+                values if hasattr(values, "__len__") else array("i", values),
+                dtype=np.int32,
+            )
+            for values in (sources, targets, weights)
+        )
+        assert len(sources) == len(targets) == len(weights)
+
+        number_of_nodes = len(self)
+        counts = np.bincount(sources, minlength=number_of_nodes)
+        if len(counts) > number_of_nodes:
+            raise ValueError("Edges from nodes that are not in the graph")
+        offsets = zeros("q", number_of_nodes + 1)
+        np.cumsum(counts, out=np.frombuffer(offsets, dtype=np.int64)[1:])
+
+        # The edge number in the low bits makes every key unique, so an
+        # unstable sort keeps the order of the edges of a node, and is several
+        # times faster than a stable argsort.
+        keys = sources.astype(np.int64) << 32
+        keys |= np.arange(len(sources), dtype=np.int64)
+        keys.sort()
+        order = keys & 0xFFFFFFFF
+        sorted_targets = zeros("i", len(targets))
+        sorted_weights = zeros("i", len(weights))
+        np.take(targets, order, out=np.frombuffer(sorted_targets, dtype=np.int32))
+        np.take(weights, order, out=np.frombuffer(sorted_weights, dtype=np.int32))
+
+        self.offsets = offsets
+        self.targets = sorted_targets
+        self.weights = sorted_weights
+
+    def reversed(self) -> "Graph":
+        # The transposed graph, sharing the node data with this one.
+        try:
+            import numpy as np  # type: ignore
+        except ImportError:
+            np = None
+
+        if np is not None:
+            degrees = np.diff(np.asarray(self.offsets))
+            sources = np.repeat(np.arange(len(self), dtype=np.int32), degrees)
+        else:
+            sources = array("i")
+            for node in range(len(self)):
+                sources.extend(
+                    array("i", [node]) * (self.offsets[node + 1] - self.offsets[node])
+                )
+        reverse = Graph(
+            self.latitudes, self.longitudes, types=self.types, names=self.names
+        )
+        reverse.set_edges(self.targets, sources, self.weights)
+        return reverse
+
+    @classmethod
+    def from_nodes(cls, nodes: list[Node]) -> "Graph":
+        graph = cls(
+            array("d", (node.pos[0] for node in nodes)),
+            array("d", (node.pos[1] for node in nodes)),
+            types=bytearray(node.type for node in nodes),
+            names={node.number: node.name for node in nodes if node.name is not None},
+        )
+        graph.set_edges(
+            (node.number for node in nodes for _ in node.edges),
+            (target for node in nodes for target, _ in node.edges),
+            (cost for node in nodes for _, cost in node.edges),
+        )
+        return graph
+
+
+def counting_sort(
+    number_of_nodes: int, sources: array, targets: array, weights: array
+) -> tuple[array, array, array]:
+    # The offsets, targets and weights of the edges sorted on their source.
+    assert len(sources) == len(targets) == len(weights)
+
+    offsets = zeros("q", number_of_nodes + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for i in range(number_of_nodes):
+        offsets[i + 1] += offsets[i]
+
+    next_position = offsets[:-1]
+    sorted_targets = zeros("i", len(targets))
+    sorted_weights = zeros("i", len(weights))
+    for source, target, weight in zip(sources, targets, weights):
+        position = next_position[source]
+        sorted_targets[position] = target
+        sorted_weights[position] = weight
+        next_position[source] = position + 1
+
+    return offsets, sorted_targets, sorted_weights
@@ -0,0 +1,189 @@
+from array import array
+from graph import Graph
+from typing import BinaryIO, Optional
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"PFGRAPH\0"
+VERSION = 1
+HEADER = struct.Struct("=8sII2q6q2q")
+HEADER_SIZE = 128
+ALIGNMENT = 8
+
+Stamp = tuple[int, ...]
+
+
+def cache_file_name(node_file: str, reverse: bool = False) -> str:
+    base = os.path.splitext(node_file)[0]
+    return f"{base}.reverse.graph" if reverse else f"{base}.graph"
+
+
+def source_stamp(*files: str) -> Stamp:
+    stamp: list[int] = list()
+    for file_name in files:
+        stat = os.stat(file_name)
+        stamp += [stat.st_size, stat.st_mtime_ns]
+    return tuple(stamp)
+
+
+def padding(size: int) -> int:
+    return -size % ALIGNMENT
+
+
+def sections(
+    number_of_nodes: int,
+    number_of_edges: int,
+    number_of_names: int,
+    name_bytes: int,
+) -> list[tuple[str, str, int]]:
+    # (attribute, typecode, length) in the order they are stored in the file.
+    return [
+        ("offsets", "q", number_of_nodes + 1),
+        ("targets", "i", number_of_edges),
+        ("weights", "i", number_of_edges),
+        ("latitudes", "d", number_of_nodes),
+        ("longitudes", "d", number_of_nodes),
+        ("types", "B", number_of_nodes),
+        ("name_nodes", "i", number_of_names),
+        ("name_offsets", "q", number_of_names + 1),
+        ("name_bytes", "B", name_bytes),
+    ]
+
+
+def flags(reverse: bool) -> int:
+    return int(reverse) | (sys.byteorder == "little") << 1
+
+
+def write_section(f: BinaryIO, data) -> None:
+    raw = memoryview(data).cast("B")
+    f.write(raw)
+    f.write(bytes(padding(len(raw))))
+
+
+def save_graph(graph: Graph, file_name: str, stamp: Stamp, reverse: bool = False):
+    name_nodes = array("i", sorted(graph.names))
+    encoded = [graph.names[node].encode() for node in name_nodes]
+    name_offsets = array("q", [0])
+    for name in encoded:
+        name_offsets.append(name_offsets[-1] + len(name))
+    name_bytes = b"".join(encoded)
+
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        flags(reverse),
+        len(graph),
+        graph.number_of_edges,
+        *stamp,
+        len(name_nodes),
+        len(name_bytes),
+    )
+    data = {
+        "offsets": graph.offsets,
+        "targets": graph.targets,
+        "weights": graph.weights,
+        "latitudes": graph.latitudes,
+        "longitudes": graph.longitudes,
+        "types": graph.types,
+        "name_nodes": name_nodes,
+        "name_offsets": name_offsets,
+        "name_bytes": name_bytes,
+    }
+
+    # Write to a temporary file first so a crashed conversion never leaves a
+    # half written cache that looks valid.
+    temporary_file_name = f"{file_name}.tmp"
+    with open(temporary_file_name, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        for attribute, _, _ in sections(
+            len(graph), graph.number_of_edges, len(name_nodes), len(name_bytes)
+        ):
+            write_section(f, data[attribute])
+    os.replace(temporary_file_name, file_name)
+
+
+def load_graph(file_name: str, stamp: Stamp, reverse: bool = False) -> Optional[Graph]:
+    if not os.path.exists(file_name):
+        return None
+
+    with open(file_name, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            return None
+
+    if len(buffer) < HEADER_SIZE:
+        return None
+    (
+        magic,
+        version,
+        file_flags,
+        number_of_nodes,
+        number_of_edges,
+        *fields,
+    ) = HEADER.unpack_from(buffer)
+    file_stamp, (number_of_names, name_bytes) = tuple(fields[:-2]), fields[-2:]
+    if (
+        magic != MAGIC
+        or version != VERSION
+        or file_flags != flags(reverse)
+        or file_stamp != stamp
+    ):
+        return None
+
+    view = memoryview(buffer)
+    position = HEADER_SIZE
+    data: dict[str, memoryview] = dict()
+    for attribute, typecode, length in sections(
+        number_of_nodes, number_of_edges, number_of_names, name_bytes
+    ):
+        size = length * array(typecode).itemsize
+        if position + size > len(buffer):
+            return None
+        data[attribute] = view[position : position + size].cast(typecode)
+        position += size + padding(size)
+
+    name_offsets = data["name_offsets"]
+    names = {
+        node: bytes(data["name_bytes"][name_offsets[i] : name_offsets[i + 1]]).decode()
+        for i, node in enumerate(data["name_nodes"])
+    }
+
+    return Graph(
+        data["latitudes"],
+        data["longitudes"],
+        data["offsets"],
+        data["targets"],
+        data["weights"],
+        data["types"],
+        names,
+    )
+
+
+if __name__ == "__main__":
+    from file_handling import read_complete
+
+    files = {
+        "island": (
+            "island_noder.txt",
+            "island_kanter.txt",
+            "island_interessepkt.txt",
+        ),
+        "skandinavia": (
+            "noder.txt",
+            "kanter.txt",
+            "interessepkt.txt",
+        ),
+    }
+
+    try:
+        chosen_files = files[sys.argv[1]]
+    except Exception:
+        print("You must specify the map you want to convert.")
+        print(f"Choices: ({','.join(files.keys())})")
+        sys.exit(1)
+
+    for reverse in (False, True):
+        read_complete(*chosen_files, reverse=reverse)
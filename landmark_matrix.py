@@ -0,0 +1,59 @@
+from array import array
+from utils import Preprocess, UNREACHABLE
+
+# Nodes handled per NumPy operation in all_estimates, which bounds the size of
+# the temporary int64 arrays.
+CHUNK_ROWS = 1 << 16
+
+
+class LandmarkMatrix:
+    # The landmark tables as uint32 NumPy arrays over the memory of the tables
+    # themselves, so a mapped landmark file stays shared and read only, with
+    # UNREACHABLE left in. Entries are only cast to int64 a chunk of nodes at
+    # a time, when the estimates are computed. Tables given as lists are
+    # copied once to uint32. NumPy is only imported when the eager ALT mode
+    # is used.
+    to_tables: list["numpy.ndarray"]  # type: ignore # noqa: F821
+    from_tables: list["numpy.ndarray"]  # type: ignore # noqa: F821
+
+    def __init__(self, to_landmarks: Preprocess, from_landmarks: Preprocess) -> None:
+        import numpy as np  # type: ignore
+
+        self.np = np
+        self.to_tables = [np.asarray(table, dtype=np.uint32) for table in to_landmarks]
+        self.from_tables = [
+            np.asarray(table, dtype=np.uint32) for table in from_landmarks
+        ]
+
+    def all_estimates(self, destination: int, estimates: array):
+        # Fills estimates, an int64 array with an entry per node, with the
+        # landmark bound of every node, CHUNK_ROWS nodes at a time. As in
+        # landmark_estimate, landmarks that can not reach, or be reached from,
+        # the destination are left out, and unreachable nodes give no bound.
+        np = self.np
+        from_terms = [
+            (table, int(table[destination]))
+            for table in self.from_tables
+            if table[destination] != UNREACHABLE
+        ]
+        to_terms = [
+            (table, int(table[destination]))
+            for table in self.to_tables
+            if table[destination] != UNREACHABLE
+        ]
+        out = np.frombuffer(estimates, dtype=np.int64)
+        for start in range(0, len(out), CHUNK_ROWS):
+            end = start + CHUNK_ROWS
+            best = out[start:end]
+            best.fill(0)
+            for table, destination_distance in from_terms:
+                # d(landmark, destination) - d(landmark, node). UNREACHABLE is
+                # larger than any distance, so it gives a negative bound.
+                bounds = destination_distance - table[start:end].astype(np.int64)
+                np.maximum(best, bounds, out=best)
+            for table, destination_distance in to_terms:
+                # d(node, landmark) - d(destination, landmark)
+                distances = table[start:end]
+                bounds = distances.astype(np.int64) - destination_distance
+                bounds[distances == UNREACHABLE] = 0
+                np.maximum(best, bounds, out=best)
@@ -0,0 +1,275 @@
+from alt_preprocess import landmark_tables
+from pathfinding import INFINITY, PathFinder
+from utils import Preprocess, UNREACHABLE
+from typing import Callable, Optional
+import math
+import random
+import sys
+
+
+def landmark_name(pathfinder: PathFinder, node: int) -> str:
+    return pathfinder.nodes.names.get(node, f"node {node}")
+
+
+def distances_from(pathfinder: PathFinder, origin: int) -> list[float | int]:
+    pathfinder.run_dijkstra(
+        origin,
+        loading_desc=f"Calculating distances from {landmark_name(pathfinder, origin)}...",
+    )
+    return list(pathfinder.best_distances)
+
+
+def farthest_node(distances: list[float | int], exclude: set[int]) -> Optional[int]:
+    farthest, farthest_distance = None, -1
+    for node, distance in enumerate(distances):
+        if distance != INFINITY and distance > farthest_distance:
+            if node not in exclude:
+                farthest, farthest_distance = node, distance
+    return farthest
+
+
+def farthest_landmarks(pathfinder: PathFinder, k: int, seed: int = 0) -> dict[int, str]:
+    # Starts at the node farthest from a random node, then repeatedly picks the
+    # node farthest from all landmarks chosen so far.
+    rng = random.Random(seed)
+    closest = distances_from(pathfinder, rng.randrange(len(pathfinder.nodes)))
+
+    landmarks: list[int] = list()
+    while len(landmarks) < k:
+        landmark = farthest_node(closest, set(landmarks))
+        if landmark is None:
+            break
+        landmarks.append(landmark)
+
+        distances = distances_from(pathfinder, landmark)
+        if len(landmarks) == 1:
+            closest = distances
+        else:
+            closest = list(map(min, closest, distances))
+
+    return {landmark: landmark_name(pathfinder, landmark) for landmark in landmarks}
+
+
+def center_node(pathfinder: PathFinder) -> int:
+    graph = pathfinder.nodes
+    connected = [
+        node
+        for node in range(len(graph))
+        if graph.offsets[node] != graph.offsets[node + 1]
+    ]
+    center_latitude = sum(graph.latitudes[node] for node in connected) / len(connected)
+    center_longitude = sum(graph.longitudes[node] for node in connected) / len(
+        connected
+    )
+    return min(
+        connected,
+        key=lambda node: (graph.latitudes[node] - center_latitude) ** 2
+        + (graph.longitudes[node] - center_longitude) ** 2,
+    )
+
+
+def planar_landmarks(pathfinder: PathFinder, k: int, seed: int = 0) -> dict[int, str]:
+    # Splits the map into k equal angular sectors around the center node, and
+    # picks the node in each sector that is farthest from the center by road.
+    graph = pathfinder.nodes
+    center = center_node(pathfinder)
+    distances = distances_from(pathfinder, center)
+    center_latitude, center_longitude = graph.pos(center)
+    longitude_scale = math.cos(math.radians(center_latitude))
+
+    best: list[tuple[float | int, Optional[int]]] = [(-1, None)] * k
+    for node, distance in enumerate(distances):
+        if distance == INFINITY or node == center:
+            continue
+        angle = math.atan2(
+            graph.latitudes[node] - center_latitude,
+            (graph.longitudes[node] - center_longitude) * longitude_scale,
+        )
+        sector = int((angle + math.pi) / (2 * math.pi) * k) % k
+        if distance > best[sector][0]:
+            best[sector] = (distance, node)
+
+    landmarks = [node for _, node in best if node is not None]
+    # Empty sectors are filled with the nodes farthest from the center.
+    while len(landmarks) < k:
+        landmark = farthest_node(distances, set(landmarks))
+        if landmark is None:
+            break
+        landmarks.append(landmark)
+
+    return {landmark: landmark_name(pathfinder, landmark) for landmark in landmarks}
+
+
+def lower_bounds(
+    origin: int, to_landmarks: Preprocess, from_landmarks: Preprocess
+) -> Callable[[int], int]:
+    def bound(node: int) -> int:
+        best = 0
+        for from_landmark in from_landmarks:
+            if UNREACHABLE not in (from_landmark[origin], from_landmark[node]):
+                best = max(best, from_landmark[node] - from_landmark[origin])
+        for to_landmark in to_landmarks:
+            if UNREACHABLE not in (to_landmark[origin], to_landmark[node]):
+                best = max(best, to_landmark[origin] - to_landmark[node])
+        return best
+
+    return bound
+
+
+def avoid_landmarks(
+    pathfinder: PathFinder, k: int, seed: int = 0, attempts: int = 10
+) -> dict[int, str]:
+    # Goldberg and Werneck's avoid: grow a shortest path tree from a random
+    # root, weigh every node by how poorly the current landmarks bound its
+    # distance from the root, and follow the heaviest landmark free subtree
+    # down to a leaf, which becomes the next landmark.
+    rng = random.Random(seed)
+    landmarks = farthest_landmarks(pathfinder, 1, seed)
+
+    while len(landmarks) < k:
+        to_landmarks, from_landmarks = landmark_tables(pathfinder, landmarks)
+
+        landmark = None
+        for _ in range(attempts):
+            root = rng.randrange(len(pathfinder.nodes))
+            distances = distances_from(pathfinder, root)
+            previous = pathfinder.previous
+            bound = lower_bounds(root, to_landmarks, from_landmarks)
+
+            children: dict[int, list[int]] = dict()
+            for node, parent in enumerate(previous):
+                if parent is not None:
+                    children.setdefault(parent, list()).append(node)
+
+            # Post order over the tree, so children are summed before parents.
+            # Subtrees that already hold a landmark get size 0.
+            size: dict[int, int] = dict()
+            has_landmark: set[int] = set()
+            stack = [(root, False)]
+            while stack:
+                node, expanded = stack.pop()
+                node_children = children.get(node, ())
+                if not expanded:
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in node_children)
+                    continue
+                if node in landmarks or any(
+                    child in has_landmark for child in node_children
+                ):
+                    has_landmark.add(node)
+                    size[node] = 0
+                else:
+                    size[node] = (
+                        distances[node]
+                        - bound(node)
+                        + sum(size[child] for child in node_children)
+                    )
+
+            node = root
+            while node in children:
+                child = max(children[node], key=size.__getitem__)
+                if size[child] == 0:
+                    break
+                node = child
+            if node != root:
+                landmark = node
+                break
+
+        if landmark is None:
+            remaining = farthest_landmarks(pathfinder, k, seed)
+            landmark = next((node for node in remaining if node not in landmarks), None)
+            if landmark is None:
+                break
+        landmarks[landmark] = landmark_name(pathfinder, landmark)
+
+    return landmarks
+
+
+STRATEGIES: dict[str, Callable[[PathFinder, int, int], dict[int, str]]] = {
+    "farthest": farthest_landmarks,
+    "planar": planar_landmarks,
+    "avoid": avoid_landmarks,
+}
+
+
+def select_landmarks(
+    pathfinder: PathFinder, k: int, strategy: str = "farthest", seed: int = 0
+) -> dict[int, str]:
+    try:
+        select = STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(
+            f"Unknown landmark strategy {strategy}, choices: {', '.join(STRATEGIES)}"
+        )
+    return select(pathfinder, k, seed)
+
+
+def evaluate_strategies(
+    pathfinder: PathFinder,
+    k: int,
+    strategies: Optional[list[str]] = None,
+    number_of_queries: int = 100,
+    seed: int = 0,
+) -> dict[str, float]:
+    if strategies is None:
+        strategies = list(STRATEGIES)
+
+    rng = random.Random(seed)
+    number_of_nodes = len(pathfinder.nodes)
+    queries = [
+        (rng.randrange(number_of_nodes), rng.randrange(number_of_nodes))
+        for _ in range(number_of_queries)
+    ]
+
+    settled: dict[str, float] = dict()
+    for origin, destination in queries:
+        pathfinder.run_dijkstra(origin, destination, loading_desc="")
+        settled["dijkstra"] = settled.get("dijkstra", 0) + pathfinder.considered_nodes
+    for strategy in strategies:
+        landmarks = select_landmarks(pathfinder, k, strategy, seed)
+        pathfinder.set_preprocess(*landmark_tables(pathfinder, landmarks))
+        settled[strategy] = 0
+        for origin, destination in queries:
+            pathfinder.run_alt(origin, destination, loading_desc="")
+            settled[strategy] += pathfinder.considered_nodes
+
+    print(
+        f"\n{'strategy':>15} {'avg settled nodes':>20}  (k={k}, {len(queries)} queries)"
+    )
+    for strategy, total in settled.items():
+        settled[strategy] = total / len(queries)
+        print(f"{strategy:>15} {settled[strategy]:>20.1f}")
+    return settled
+
+
+if __name__ == "__main__":
+    from file_handling import read_complete_bidirectional
+
+    files = {
+        "island": (
+            "island_noder.txt",
+            "island_kanter.txt",
+            "island_interessepkt.txt",
+        ),
+        "skandinavia": (
+            "noder.txt",
+            "kanter.txt",
+            "interessepkt.txt",
+        ),
+    }
+    loading_bar = False
+
+    try:
+        chosen_files = files[sys.argv[1]]
+        ks = list(map(int, sys.argv[2:])) or [6]
+    except Exception:
+        print("You must specify the map you want to evaluate landmarks on.")
+        print(f"Choices: ({','.join(files.keys())}) [k ...]")
+        sys.exit(1)
+
+    nodes, reverse_nodes = read_complete_bidirectional(
+        *chosen_files, loading_bar=loading_bar
+    )
+    pathfinder = PathFinder(nodes, loading_bar, reverse_nodes)
+    for k in ks:
+        evaluate_strategies(pathfinder, k)
@@ -1,8 +1,9 @@
+from typing import Callable
 from alt_preprocess import load_preprocess
+from categories import CHARGING_STATION, DRINKING_PLACE, EATING_PLACE
 from pathfinding import PathFinder
 from utils import Node, cs_to_hour_min_sec
-import utils
-from file_handling import read_complete
+from file_handling import read_complete_bidirectional
 
 from timeit import default_timer as timer
 
@@ -46,12 +47,17 @@ def print_benchmark_results(
     )
 
 
-def benchmark_dijkstra(pathfinder: PathFinder, origin_name: str, destination_name: str):
+def benchmark(
+    pathfinder: PathFinder,
+    run: Callable[[int, int], tuple[float | int, list[Node]]],
+    origin_name: str,
+    destination_name: str,
+):
     origin = DESTINATIONS[origin_name]
     destination = DESTINATIONS[destination_name]
 
     start = timer()
-    distance, path = pathfinder.run_dijkstra(origin, destination)
+    distance, path = run(origin, destination)
     end = timer()
 
     print_benchmark_results(
@@ -64,25 +70,38 @@ def benchmark_dijkstra(pathfinder: PathFinder, origin_name: str, destination_nam
     )
 
 
+def benchmark_dijkstra(pathfinder: PathFinder, origin_name: str, destination_name: str):
+    benchmark(pathfinder, pathfinder.run_dijkstra, origin_name, destination_name)
+
+
 def benchmark_alt(
     pathfinder: PathFinder,
     origin_name: str,
     destination_name: str,
 ):
-    origin = DESTINATIONS[origin_name]
-    destination = DESTINATIONS[destination_name]
+    benchmark(pathfinder, pathfinder.run_alt, origin_name, destination_name)
 
-    start = timer()
-    distance, path = pathfinder.run_alt(origin, destination)
-    end = timer()
 
-    print_benchmark_results(
-        distance,
-        len(path),
-        pathfinder.considered_nodes,
+def benchmark_astar(pathfinder: PathFinder, origin_name: str, destination_name: str):
+    benchmark(pathfinder, pathfinder.run_astar, origin_name, destination_name)
+
+
+def benchmark_bidirectional_dijkstra(
+    pathfinder: PathFinder, origin_name: str, destination_name: str
+):
+    benchmark(
+        pathfinder,
+        pathfinder.run_bidirectional_dijkstra,
         origin_name,
         destination_name,
-        end - start,
+    )
+
+
+def benchmark_bidirectional_alt(
+    pathfinder: PathFinder, origin_name: str, destination_name: str
+):
+    benchmark(
+        pathfinder, pathfinder.run_bidirectional_alt, origin_name, destination_name
     )
 
 
@@ -109,23 +128,29 @@ def export_path(
 
 if __name__ == "__main__":
     loading_bar = False
-    nodes = read_complete(
+    nodes, reverse_nodes = read_complete_bidirectional(
         "noder.txt", "kanter.txt", "interessepkt.txt", loading_bar=loading_bar
     )
-    pathfinder = PathFinder(nodes, loading_bar)
+    pathfinder = PathFinder(nodes, loading_bar, reverse_nodes)
 
     benchmark_dijkstra(pathfinder, "Tampere", "Ålesund")
+    benchmark_bidirectional_dijkstra(pathfinder, "Tampere", "Ålesund")
     benchmark_dijkstra(pathfinder, "Kårvåg", "Gjemnes")
+    benchmark_bidirectional_dijkstra(pathfinder, "Kårvåg", "Gjemnes")
+    benchmark_astar(pathfinder, "Tampere", "Ålesund")
+    benchmark_astar(pathfinder, "Kårvåg", "Gjemnes")
 
-    to_landmarks, from_landmarks = load_preprocess("preprocess.csv", loading_bar)
+    to_landmarks, from_landmarks = load_preprocess("preprocess.landmarks")
     pathfinder.set_preprocess(to_landmarks, from_landmarks)
     benchmark_alt(pathfinder, "Tampere", "Ålesund")
+    benchmark_bidirectional_alt(pathfinder, "Tampere", "Ålesund")
     benchmark_alt(pathfinder, "Kårvåg", "Gjemnes")
+    benchmark_bidirectional_alt(pathfinder, "Kårvåg", "Gjemnes")
 
     export_path(pathfinder, "Oslo", "Trondheim", "oslo_trondheim.csv")
 
     charging_stations = pathfinder.closest_n_nodes(
-        DESTINATIONS["Trondheim lufthavn, Værnes"], 8, utils.is_charging_station
+        DESTINATIONS["Trondheim lufthavn, Værnes"], 8, CHARGING_STATION
     )
     write_coordinates(
         map(lambda n: pathfinder.nodes[n[0]], charging_stations),
@@ -133,14 +158,14 @@ if __name__ == "__main__":
     )
 
     drinking_places = pathfinder.closest_n_nodes(
-        DESTINATIONS["Trondheim torg"], 8, utils.is_drinking_place
+        DESTINATIONS["Trondheim torg"], 8, DRINKING_PLACE
     )
     write_coordinates(
         map(lambda n: pathfinder.nodes[n[0]], drinking_places), "drinking_places.csv"
     )
 
     eating_places = pathfinder.closest_n_nodes(
-        DESTINATIONS["Hemsedal"], 8, utils.is_eating_place
+        DESTINATIONS["Hemsedal"], 8, EATING_PLACE
     )
     write_coordinates(
         map(lambda n: pathfinder.nodes[n[0]], eating_places), "eating_places.csv"
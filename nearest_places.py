@@ -0,0 +1,177 @@
+from array import array
+from heapq import heappop, heappush
+from categories import CategoryIndex, category_mask
+from graph import Graph, zeros
+from graph_cache import padding, write_section
+from utils import LoadingBarMocker, UNREACHABLE
+import mmap
+import struct
+import sys
+
+MAGIC = b"PFPLACE\0"
+VERSION = 1
+HEADER = struct.Struct("=8sIIqq")
+HEADER_SIZE = 64
+
+NO_PLACE = -1
+
+
+class NearestPlaces:
+    # The k closest places of the categories in mask from every node, closest
+    # first. Entries past the last reachable place are NO_PLACE, with
+    # UNREACHABLE as distance. Rows are stored per node, so a lookup reads k
+    # consecutive entries.
+    mask: int
+    k: int
+    places: array | memoryview
+    distances: array | memoryview
+
+    def __init__(
+        self,
+        mask: int,
+        k: int,
+        places: array | memoryview,
+        distances: array | memoryview,
+    ) -> None:
+        assert len(places) == len(distances)
+        self.mask = mask
+        self.k = k
+        self.places = places
+        self.distances = distances
+
+    def __len__(self) -> int:
+        return len(self.places) // self.k
+
+    def lookup(self, node: int, n: int) -> list[tuple[int, int]]:
+        # The same (place, distance) pairs closest_n_nodes finds, for n <= k.
+        assert n <= self.k
+        start = node * self.k
+        return [
+            (place, distance)
+            for place, distance in zip(
+                self.places[start : start + n], self.distances[start : start + n]
+            )
+            if place != NO_PLACE
+        ]
+
+
+def nearest_places(
+    reverse_graph: Graph, mask: int, k: int, loading_bar: bool = False
+) -> NearestPlaces:
+    # Multi source Dijkstra from every place on the reverse graph, so the
+    # distances are from the nodes to the places. A node takes the first k
+    # distinct places that reach it, and only passes those on. If a place is
+    # not among the k closest of a node, the k closer places of that node are
+    # also closer from every node whose shortest path to the place runs
+    # through it, so nothing is lost.
+    number_of_nodes = len(reverse_graph)
+    places = array("i", [NO_PLACE]) * (number_of_nodes * k)
+    distances = array("I", [UNREACHABLE]) * (number_of_nodes * k)
+    counts = zeros("i", number_of_nodes)
+
+    heap = [(0, place, place) for place in CategoryIndex(reverse_graph).nodes(mask)]
+
+    if loading_bar:
+        from tqdm import tqdm  # type: ignore
+
+        bar = tqdm(total=number_of_nodes * k, desc="Finding nearest places...")
+    else:
+        print("Finding nearest places...")
+        bar = LoadingBarMocker()
+
+    offsets = reverse_graph.offsets
+    targets = reverse_graph.targets
+    weights = reverse_graph.weights
+    pop, push = heappop, heappush
+    while heap:
+        distance, node, place = pop(heap)
+        count = counts[node]
+        if count == k:
+            continue
+        row = node * k
+        if place in places[row : row + count]:
+            continue
+        places[row + count] = place
+        distances[row + count] = distance
+        counts[node] = count + 1
+        bar.update(1)
+
+        for edge in range(offsets[node], offsets[node + 1]):
+            target = targets[edge]
+            if counts[target] < k:
+                push(heap, (distance + weights[edge], target, place))
+
+    bar.close()
+    return NearestPlaces(mask, k, places, distances)
+
+
+def save_nearest_places(table: NearestPlaces, file_name: str):
+    with open(file_name, "wb") as f:
+        f.write(
+            HEADER.pack(MAGIC, VERSION, table.mask, len(table), table.k).ljust(
+                HEADER_SIZE, b"\0"
+            )
+        )
+        write_section(f, table.places)
+        write_section(f, table.distances)
+
+
+def load_nearest_places(file_name: str) -> NearestPlaces:
+    print("Reading nearest places...")
+    with open(file_name, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, mask, number_of_nodes, k = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError(f"{file_name} is not a nearest places file")
+    if version != VERSION:
+        raise ValueError(f"Unsupported nearest places version {version}")
+    size = number_of_nodes * k * 4
+    if HEADER_SIZE + 2 * (size + padding(size)) > len(buffer):
+        raise ValueError(f"{file_name} is truncated")
+
+    view = memoryview(buffer)
+    places_start = HEADER_SIZE
+    distances_start = places_start + size + padding(size)
+    return NearestPlaces(
+        mask,
+        k,
+        view[places_start : places_start + size].cast("i"),
+        view[distances_start : distances_start + size].cast("I"),
+    )
+
+
+if __name__ == "__main__":
+    from file_handling import read_complete
+
+    files = {
+        "island": (
+            "island_noder.txt",
+            "island_kanter.txt",
+            "island_interessepkt.txt",
+            "island_",
+        ),
+        "skandinavia": (
+            "noder.txt",
+            "kanter.txt",
+            "interessepkt.txt",
+            "",
+        ),
+    }
+    loading_bar = False
+
+    try:
+        chosen_files = files[sys.argv[1]]
+        categories = sys.argv[2]
+        mask = category_mask(categories)
+        k = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    except Exception:
+        print("You must specify the map and the categories to precompute.")
+        print(f"Choices: ({','.join(files.keys())}) <category[,category...]> [k]")
+        sys.exit(1)
+
+    reverse_graph = read_complete(*chosen_files[:3], reverse=True)
+    table = nearest_places(reverse_graph, mask, k, loading_bar)
+    file_name = f"{chosen_files[3]}{categories.replace(',', '_')}.places"
+    save_nearest_places(table, file_name)
+    print(f"Saved nearest places to {file_name}")
@@ -1,12 +1,174 @@
-from typing import Callable, Optional
+from typing import Callable, Optional, Sequence
+from dataclasses import asdict, dataclass
+from timeit import default_timer as timer
 
-from queue import PriorityQueue
-from utils import LoadingBarMocker, Preprocess
-from file_handling import read_complete
-from utils import Node, is_gas_station
+from array import array
+
+from heapq import heapify, heappop, heappush
+import functools
+import threading
+from utils import LoadingBarMocker, Preprocess, UNREACHABLE
+from graph import Graph, zeros
+from contraction import ContractionHierarchy
+from landmark_matrix import LandmarkMatrix
+from categories import CategoryIndex, CategoryTerms, category_terms
+from nearest_places import NearestPlaces
+from geographic import GeographicBound
+from radix_heap import RadixHeap, radix_pop, radix_push
+from spatial_index import SpatialIndex
+from utils import Node
 
 INFINITY = float("inf")
 
+# A node number, or a (latitude, longitude) that is snapped to the closest node.
+Location = int | tuple[float, float]
+
+# Called with the number of nodes settled so far in the query, every
+# observe_interval settled nodes.
+Observer = Callable[[int], None]
+OBSERVE_INTERVAL = 1024
+
+
+# (distance table, distance of the query destination in it) per landmark.
+LandmarkTerms = list[tuple[Sequence[int], int]]
+
+
+def landmark_terms(
+    destination: int, from_landmarks: Preprocess, to_landmarks: Preprocess
+) -> tuple[LandmarkTerms, LandmarkTerms]:
+    # Landmarks that can not reach, or be reached from, the destination give
+    # no bound and are left out.
+    return (
+        [
+            (from_landmark, from_landmark[destination])
+            for from_landmark in from_landmarks
+            if from_landmark[destination] != UNREACHABLE
+        ],
+        [
+            (to_landmark, to_landmark[destination])
+            for to_landmark in to_landmarks
+            if to_landmark[destination] != UNREACHABLE
+        ],
+    )
+
+
+def landmark_estimate(
+    from_destination: LandmarkTerms, to_destination: LandmarkTerms
+) -> Callable[[int], int]:
+    def estimate(node: int) -> int:
+        best = 0
+        for from_landmark, destination_distance in from_destination:
+            node_distance = from_landmark[node]
+            if node_distance != UNREACHABLE and (
+                destination_distance - node_distance > best
+            ):
+                best = destination_distance - node_distance
+        for to_landmark, destination_distance in to_destination:
+            node_distance = to_landmark[node]
+            if node_distance != UNREACHABLE and (
+                node_distance - destination_distance > best
+            ):
+                best = node_distance - destination_distance
+        return best
+
+    return estimate
+
+
+def upward_distances(
+    origin: int, offsets: Sequence[int], targets: Sequence[int], weights: Sequence[int]
+) -> dict[int, int]:
+    # Complete search from origin over one direction of a contraction
+    # hierarchy. The search space is small, so distances are kept in a dict.
+    distances = {origin: 0}
+    settled: set[int] = set()
+    heap = [(0, origin)]
+    while heap:
+        current_distance, current_node = heappop(heap)
+        if current_node in settled:
+            continue
+        settled.add(current_node)
+        for edge in range(offsets[current_node], offsets[current_node + 1]):
+            target = targets[edge]
+            distance = current_distance + weights[edge]
+            if distance < distances.get(target, distance + 1):
+                distances[target] = distance
+                heappush(heap, (distance, target))
+    return distances
+
+
+class ActiveLandmarks:
+    # ALT estimate over a small subset of the landmarks. It starts with the k
+    # landmarks giving the best bound from the origin. When reselect finds a
+    # landmark outside the set that bounds the current node better, that
+    # landmark is added, up to max_active. A max over more landmarks is still
+    # consistent, so the search stays exact.
+    from_destination: LandmarkTerms
+    to_destination: LandmarkTerms
+    active: set[tuple[bool, int]]
+    max_active: int
+    estimate: Callable[[int], int]
+
+    def __init__(
+        self,
+        from_destination: LandmarkTerms,
+        to_destination: LandmarkTerms,
+        origin: int,
+        k: int,
+        max_active: Optional[int] = None,
+    ) -> None:
+        self.from_destination = from_destination
+        self.to_destination = to_destination
+        self.max_active = max_active if max_active is not None else 2 * k
+        ranked = sorted(
+            self.bounds(origin).items(), key=lambda item: item[1], reverse=True
+        )
+        self.active = {term for term, _ in ranked[:k]}
+        self.update_estimate()
+
+    def __call__(self, node: int) -> int:
+        return self.estimate(node)
+
+    def bounds(self, node: int) -> dict[tuple[bool, int], int]:
+        # Bound from node to the destination given by each landmark, keyed by
+        # (is from landmark, index).
+        bounds: dict[tuple[bool, int], int] = dict()
+        for i, (from_landmark, destination_distance) in enumerate(
+            self.from_destination
+        ):
+            if from_landmark[node] != UNREACHABLE:
+                bounds[(True, i)] = destination_distance - from_landmark[node]
+        for i, (to_landmark, destination_distance) in enumerate(self.to_destination):
+            if to_landmark[node] != UNREACHABLE:
+                bounds[(False, i)] = to_landmark[node] - destination_distance
+        return bounds
+
+    def update_estimate(self):
+        self.estimate = landmark_estimate(
+            [
+                term
+                for i, term in enumerate(self.from_destination)
+                if (True, i) in self.active
+            ],
+            [
+                term
+                for i, term in enumerate(self.to_destination)
+                if (False, i) in self.active
+            ],
+        )
+
+    def reselect(self, node: int) -> bool:
+        if len(self.active) >= self.max_active:
+            return False
+        bounds = self.bounds(node)
+        if not bounds:
+            return False
+        best = max(bounds, key=bounds.__getitem__)
+        if best in self.active or bounds[best] <= self.estimate(node):
+            return False
+        self.active.add(best)
+        self.update_estimate()
+        return True
+
 
 class DijkstraHeap:
     dist_heap: list[int]
@@ -15,58 +177,331 @@ class DijkstraHeap:
     heap_positions: list[int]
 
 
-class PathFinder:
-    nodes: list[Node]
+class Workspace:
+    # Search state that is kept between queries. Every node a search reaches
+    # is recorded in touched, and reset only puts those nodes back, so
+    # starting a query costs the size of the previous search rather than the
+    # size of the graph. After a search that reached most of the graph, the
+    # lists are allocated anew instead, which is faster.
+    distances: list[int | float]
+    previous: list[Optional[int]]
+    visited: list[bool]
+    estimates: list[int | float]
+    touched: list[int]
+    # Estimates of every node, filled at once by the eager modes. It is not
+    # reset, and only allocated when first used.
+    bulk_estimates: Optional[array] = None
+    # Potentials of bidirectional searches, with None for not computed yet.
+    # Only allocated when first used.
+    potentials: Optional[list[Optional[int | float]]] = None
+
+    def __init__(self, number_of_nodes: int) -> None:
+        self.touched = list()
+        self.allocate(number_of_nodes)
+
+    def get_bulk_estimates(self) -> array:
+        if self.bulk_estimates is None:
+            self.bulk_estimates = zeros("q", len(self.distances))
+        return self.bulk_estimates
+
+    def get_potentials(self) -> list[Optional[int | float]]:
+        if self.potentials is None:
+            self.potentials = [None] * len(self.distances)
+        return self.potentials
+
+    def allocate(self, number_of_nodes: int):
+        self.distances = [INFINITY] * number_of_nodes
+        self.previous = [None] * number_of_nodes
+        self.visited = [False] * number_of_nodes
+        self.estimates = [-1] * number_of_nodes
+        if self.potentials is not None:
+            self.potentials = [None] * number_of_nodes
+        self.touched.clear()
+
+    def reset(self):
+        touched = self.touched
+        if len(touched) > len(self.distances) // 8:
+            self.allocate(len(self.distances))
+            return
+        distances, previous = self.distances, self.previous
+        visited, estimates = self.visited, self.estimates
+        for node in touched:
+            distances[node] = INFINITY
+            previous[node] = None
+            visited[node] = False
+            estimates[node] = -1
+        if self.potentials is not None:
+            potentials = self.potentials
+            for node in touched:
+                potentials[node] = None
+        touched.clear()
+
+
+@dataclass
+class SearchStats:
+    # Counters of a query, and the seconds spent in each phase. A new object
+    # is made for every query, so it can be kept after the next one starts.
+    # heuristic_evaluations counts estimates computed per node, not the ones
+    # computed in bulk with NumPy.
+    settled: int = 0
+    relaxed_edges: int = 0
+    heap_pushes: int = 0
+    stale_pops: int = 0
+    heuristic_evaluations: int = 0
+    reset_time: float = 0.0
+    search_time: float = 0.0
+    path_time: float = 0.0
+
+    def add(self, other: "SearchStats"):
+        for name, value in asdict(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+
+def next_checkpoint(*checkpoints: int) -> int:
+    # The closest of the settled counts a search loop acts on, -1 for none.
+    return min((checkpoint for checkpoint in checkpoints if checkpoint > 0), default=-1)
+
+
+class SearchContext:
+    # Search state and statistics of the queries of one thread. The graph,
+    # landmarks and hierarchy of a PathFinder are shared by all threads, but
+    # every thread querying it gets its own context.
     loading_bar: bool
     current_loading_bar: LoadingBarMocker
+    loading_desc: str = ""
+    observer: Optional[Observer] = None
+    observe_interval: int = OBSERVE_INTERVAL
 
-    origin: int
-    destination: int
-    considered_nodes: int
+    origin: Optional[int] = None
+    destination: Optional[int] = None
+    stats: SearchStats
     best_distances: list[int]
     previous: list[int]
     visited: list[bool]
-    heap: PriorityQueue
+    heap: list[tuple[int | float, int]] | RadixHeap
+    backward_distances: list[int]
+    backward_previous: list[int]
+    workspace: Optional[Workspace] = None
+    backward_workspace: Optional[Workspace] = None
+
+    def __init__(self, loading_bar: bool = False) -> None:
+        self.loading_bar = loading_bar
+        self.current_loading_bar = LoadingBarMocker()
+        self.stats = SearchStats()
 
-    to_landmarks: Preprocess
-    from_landmarks: Preprocess
 
-    def __init__(self, nodes: list[Node], loading_bar: bool = False) -> None:
+def context_attribute(name: str) -> property:
+    # Attribute of a PathFinder that lives in the context of the calling thread.
+    def get(pathfinder: "PathFinder"):
+        return getattr(pathfinder.context, name)
+
+    def set(pathfinder: "PathFinder", value):
+        setattr(pathfinder.context, name, value)
+
+    return property(get, set)
+
+
+def query(method: Callable) -> Callable:
+    # Query method of a PathFinder that also takes stats. With stats=True it
+    # returns (result, stats of the query). The context only keeps the stats
+    # of the last query of a thread, which async tasks sharing the thread
+    # overwrite for each other, so this is how they get their own.
+    @functools.wraps(method)
+    def run(self: "PathFinder", *args, stats: bool = False, **kwargs):
+        result = method(self, *args, **kwargs)
+        if stats:
+            return result, self.stats
+        return result
+
+    return run
+
+
+class PathFinder:
+    # Queries only change the SearchContext of the calling thread, so one
+    # PathFinder can serve queries from many threads at once. Each query
+    # method returns its result, with its statistics when called with
+    # stats=True. The statistics of the last query of a thread can also be
+    # read from its context, or through the attributes below.
+    # The observer of a thread is called with the progress of its searches,
+    # and takes the place of the loading bar while it is set. queue picks the
+    # priority queue of search: "heap" for heapq, or "radix" for RadixHeap,
+    # which needs integer keys that never go below the last one popped.
+    # Changing the landmarks or hierarchy is not safe while queries run.
+    nodes: Graph
+    reverse_nodes: Optional[Graph]
+    default_loading_bar: bool
+    local: threading.local
+    lock: threading.Lock
+
+    loading_bar = context_attribute("loading_bar")
+    current_loading_bar = context_attribute("current_loading_bar")
+    loading_desc = context_attribute("loading_desc")
+    observer = context_attribute("observer")
+    observe_interval = context_attribute("observe_interval")
+    origin = context_attribute("origin")
+    destination = context_attribute("destination")
+    stats = context_attribute("stats")
+    best_distances = context_attribute("best_distances")
+    previous = context_attribute("previous")
+    visited = context_attribute("visited")
+    heap = context_attribute("heap")
+    backward_distances = context_attribute("backward_distances")
+    backward_previous = context_attribute("backward_previous")
+    workspace = context_attribute("workspace")
+    backward_workspace = context_attribute("backward_workspace")
+
+    to_landmarks: Preprocess = []
+    from_landmarks: Preprocess = []
+    landmark_matrix: Optional[LandmarkMatrix] = None
+    geographic_bound: Optional[GeographicBound] = None
+    category_bounds: dict[int, tuple[CategoryTerms, CategoryTerms]]
+    category_index: Optional[CategoryIndex] = None
+    nearest_places: dict[int, NearestPlaces]
+    hierarchy: Optional[ContractionHierarchy] = None
+    spatial_index: Optional[SpatialIndex] = None
+    queue: str = "heap"
+
+    def __init__(
+        self,
+        nodes: Graph | list[Node],
+        loading_bar: bool = False,
+        reverse_nodes: Optional[Graph | list[Node]] = None,
+    ) -> None:
+        if not isinstance(nodes, Graph):
+            nodes = Graph.from_nodes(nodes)
+        if reverse_nodes is not None and not isinstance(reverse_nodes, Graph):
+            reverse_nodes = Graph.from_nodes(reverse_nodes)
         self.nodes = nodes
-        self.loading_bar = loading_bar
+        self.reverse_nodes = reverse_nodes
+        self.default_loading_bar = loading_bar
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.category_bounds = dict()
+        self.nearest_places = dict()
+
+    @property
+    def context(self) -> SearchContext:
+        context = getattr(self.local, "context", None)
+        if context is None:
+            context = self.local.context = SearchContext(self.default_loading_bar)
+        return context
+
+    @property
+    def considered_nodes(self) -> int:
+        return self.stats.settled
+
+    @considered_nodes.setter
+    def considered_nodes(self, value: int):
+        self.stats.settled = value
 
     def reset_common(self):
+        start = timer()
+        self.stats = SearchStats()
         self.origin = None
         self.destination = None
         self.current_loading_bar = LoadingBarMocker()
-        self.considered_nodes = 0
-        self.best_distances = [INFINITY] * len(self.nodes)
-        self.previous = [None] * len(self.nodes)
-        self.visited = [False] * len(self.nodes)
-        self.heap = PriorityQueue()
+        if self.workspace is None:
+            self.workspace = Workspace(len(self.nodes))
+        else:
+            self.workspace.reset()
+        self.best_distances = self.workspace.distances
+        self.previous = self.workspace.previous
+        self.visited = self.workspace.visited
+        self.heap = list()
+        self.stats.reset_time += timer() - start
+
+    def reset_backward(self) -> Workspace:
+        # Search state of the backward side of bidirectional queries.
+        start = timer()
+        if self.backward_workspace is None:
+            self.backward_workspace = Workspace(len(self.nodes))
+        else:
+            self.backward_workspace.reset()
+        self.backward_distances = self.backward_workspace.distances
+        self.backward_previous = self.backward_workspace.previous
+        self.stats.reset_time += timer() - start
+        return self.backward_workspace
 
     def reset_preprocess(self):
         self.to_landmarks = [[0] * len(self.nodes)]
         self.from_landmarks = [[0] * len(self.nodes)]
+        self.clear_landmark_caches()
 
     def set_preprocess(
         self,
-        to_landmarks: list[list[float | int]],
-        from_landmarks: list[list[float | int]],
+        to_landmarks: Preprocess,
+        from_landmarks: Preprocess,
     ):
         self.to_landmarks = to_landmarks
         self.from_landmarks = from_landmarks
+        self.clear_landmark_caches()
 
-    def find_next_considerations(
-        self, target_predicate: Optional[Callable[[int], bool]] = None
-    ):
-        if target_predicate is None:
-            if self.destination is not None:
-                target_predicate = lambda i: i == self.destination
-            else:
-                target_predicate = lambda i: False
+    def clear_landmark_caches(self):
+        self.landmark_matrix = None
+        self.category_bounds = dict()
 
-        if self.loading_bar:
+    def get_landmark_matrix(self) -> LandmarkMatrix:
+        with self.lock:
+            if self.landmark_matrix is None:
+                self.landmark_matrix = LandmarkMatrix(
+                    self.to_landmarks, self.from_landmarks
+                )
+            return self.landmark_matrix
+
+    def get_geographic_bound(self) -> GeographicBound:
+        with self.lock:
+            if self.geographic_bound is None:
+                self.geographic_bound = GeographicBound(self.nodes)
+            return self.geographic_bound
+
+    def get_reverse_nodes(self) -> Graph:
+        # The reverse graph is normally given up front from
+        # read_complete_bidirectional, but can be built from the forward one.
+        with self.lock:
+            if self.reverse_nodes is None:
+                self.reverse_nodes = self.nodes.reversed()
+            return self.reverse_nodes
+
+    def get_category_index(self) -> CategoryIndex:
+        with self.lock:
+            if self.category_index is None:
+                self.category_index = CategoryIndex(self.nodes)
+            return self.category_index
+
+    def category_estimate(self, mask: int) -> Callable[[int], int]:
+        # Lower bound of the distance from a node to the closest place in the
+        # categories of mask, from the landmarks.
+        index = self.get_category_index()
+        with self.lock:
+            if mask not in self.category_bounds:
+                self.category_bounds[mask] = category_terms(
+                    index.nodes(mask),
+                    self.from_landmarks,
+                    self.to_landmarks,
+                )
+            return landmark_estimate(*self.category_bounds[mask])
+
+    def set_nearest_places(self, table: NearestPlaces):
+        assert len(table) == len(self.nodes)
+        self.nearest_places[table.mask] = table
+
+    def set_hierarchy(self, hierarchy: ContractionHierarchy):
+        assert len(hierarchy) == len(self.nodes)
+        self.hierarchy = hierarchy
+
+    def set_spatial_index(self, index: SpatialIndex):
+        assert len(index.latitudes) == len(self.nodes)
+        self.spatial_index = index
+
+    def node_of(self, location: Location) -> int:
+        if isinstance(location, int):
+            return location
+        if self.spatial_index is None:
+            raise ValueError("Coordinates need set_spatial_index")
+        return self.spatial_index.snap(*location)
+
+    def start_loading_bar(self):
+        if self.loading_bar and self.observer is None:
             from tqdm import tqdm
 
             self.current_loading_bar = tqdm(
@@ -77,158 +512,842 @@ class PathFinder:
             if self.loading_desc:
                 print(self.loading_desc)
 
-        while not self.heap.empty():
-            heap_result = self.heap.get()
-            current_distance, current_node = heap_result[-2:]
+    def current_observer(self) -> Optional[Observer]:
+        # The observer of the search about to start: the one that is set, or
+        # one that moves the loading bar when it is on.
+        if self.observer is not None:
+            return self.observer
+        if self.loading_bar:
+            bar = self.current_loading_bar
+            return lambda settled: bar.update(settled - bar.n)
+        return None
+
+    def close_loading_bar(self):
+        bar = self.current_loading_bar
+        bar.update(self.stats.settled - bar.n)
+        bar.close()
+
+    def search(
+        self,
+        origin: int,
+        destination: Optional[int] = None,
+        target_predicate: Optional[Callable[[int], bool]] = None,
+        targets_wanted: int = 1,
+        estimate: Optional[Callable[[int], int | float]] = None,
+        reselect: Optional[Callable[[int], bool]] = None,
+        reselect_interval: int = 0,
+        estimates: Optional[Sequence[int | float]] = None,
+        max_distance: int | float = INFINITY,
+    ) -> list[tuple[int, int]]:
+        # Settles nodes from origin until destination is settled, or until
+        # targets_wanted nodes matching target_predicate are settled, or until
+        # the next node is farther away than max_distance. With an
+        # estimate the queue is ordered by distance + estimate (A*), which
+        # requires the estimate to be consistent. Nodes are then not settled in
+        # order of distance, so max_distance must not be combined with an
+        # estimate. Returns the settled targets.
+        #
+        # reselect is called with the current node every reselect_interval
+        # settled nodes, and returns whether the estimate changed. If it did,
+        # cached estimates are dropped and the queue keys are recomputed.
+        #
+        # estimates caches the estimate per node, with -1 for not computed yet,
+        # and can be given already filled in.
+        start = timer()
+        assert self.workspace is not None
+        touched = self.workspace.touched
+        if self.best_distances[origin] == INFINITY:
+            touched.append(origin)
+        self.best_distances[origin] = 0
+        self.start_loading_bar()
+        stats = self.stats
+
+        # Hot loop: everything is bound to locals, and the heap holds flat
+        # (priority, node) tuples. Stale entries are skipped on pop through
+        # the visited list instead of being removed from the heap.
+        heap = self.heap
+        heap.append((0, origin))
+        if self.queue == "radix":
+            # Reselection lowers keys already in the queue, which a monotone
+            # queue can not take.
+            if reselect is not None:
+                raise ValueError("The radix queue does not support reselection")
+            seeded, heap = heap, RadixHeap()
+            for item in seeded:
+                radix_push(heap, item)
+            self.heap = heap
+            pop, push = radix_pop, radix_push
+        elif self.queue == "heap":
+            pop, push = heappop, heappush
+        else:
+            raise ValueError(f"Unknown queue {self.queue}")
+        best_distances = self.best_distances
+        previous = self.previous
+        visited = self.visited
+        offsets = self.nodes.offsets
+        targets = self.nodes.targets
+        weights = self.nodes.weights
+        if estimates is None:
+            estimates = self.workspace.estimates if estimate is not None else list()
+        touch = touched.append
+        observe = self.current_observer()
+        observe_interval = self.observe_interval
+        next_observe = observe_interval if observe is not None else -1
+        next_reselect = reselect_interval if reselect is not None else -1
+        next_check = next_checkpoint(next_observe, next_reselect)
 
-            if self.visited[current_node]:
+        # Statistics are kept in locals and added to stats when done.
+        found: list[tuple[int, int]] = list()
+        considered_nodes = relaxed_edges = stale_pops = evaluations = 0
+        heap_pushes = 1
+        while heap:
+            current_node = pop(heap)[1]
+            if visited[current_node]:
+                stale_pops += 1
                 continue
+            current_distance = best_distances[current_node]
+            if current_distance > max_distance:
+                break
+            visited[current_node] = True
 
-            self.visited[current_node] = True
-            if target_predicate(current_node):
-                yield current_node, current_distance
+            if current_node == destination:
+                found.append((current_node, current_distance))
+                break
+            if target_predicate is not None and target_predicate(current_node):
+                found.append((current_node, current_distance))
+                if len(found) == targets_wanted:
+                    break
 
-            if self.loading_bar:
-                self.current_loading_bar.update(1)
-            self.considered_nodes += 1
-            for target, cost in self.nodes[current_node].edges:
-                if self.visited[target]:
-                    continue
-                yield current_node, target, cost + self.best_distances[current_node]
+            considered_nodes += 1
+            # The observer and reselection share one check per settled node,
+            # which never matches when both are off.
+            if considered_nodes == next_check:
+                if considered_nodes == next_observe:
+                    next_observe += observe_interval
+                    observe(stats.settled + considered_nodes)
+                if considered_nodes == next_reselect:
+                    next_reselect += reselect_interval
+                    if reselect(current_node):
+                        # Only touched nodes can have an estimate.
+                        for node in touched:
+                            estimates[node] = -1
+                        heap[:] = [
+                            (best_distances[node] + estimate(node), node)
+                            for _, node in heap
+                            if not visited[node]
+                        ]
+                        evaluations += len(heap)
+                        heapify(heap)
+                next_check = next_checkpoint(next_observe, next_reselect)
 
-    def get_path(self, destination: int):
+            first_edge, last_edge = offsets[current_node], offsets[current_node + 1]
+            relaxed_edges += last_edge - first_edge
+            for edge in range(first_edge, last_edge):
+                target = targets[edge]
+                distance = current_distance + weights[edge]
+                if distance < best_distances[target]:
+                    if best_distances[target] == INFINITY:
+                        touch(target)
+                    best_distances[target] = distance
+                    previous[target] = current_node
+                    heap_pushes += 1
+                    if estimate is None:
+                        push(heap, (distance, target))
+                    else:
+                        target_estimate = estimates[target]
+                        if target_estimate < 0:
+                            evaluations += 1
+                            target_estimate = estimates[target] = estimate(target)
+                        push(heap, (distance + target_estimate, target))
+
+        stats.settled += considered_nodes
+        stats.relaxed_edges += relaxed_edges
+        stats.heap_pushes += heap_pushes
+        stats.stale_pops += stale_pops
+        stats.heuristic_evaluations += evaluations
+        self.close_loading_bar()
+        stats.search_time += timer() - start
+        return found
+
+    def bidirectional_search(
+        self,
+        origin: int,
+        destination: int,
+        potential: Optional[Callable[[int], int | float]] = None,
+    ) -> Optional[int]:
+        # Runs a forward search from origin and a backward search on the
+        # reverse graph from destination, always expanding the side with the
+        # smaller queue key. The forward side orders by distance + potential,
+        # and the backward side by distance - potential, so a consistent
+        # potential keeps both searches exact. The searches stop once the two
+        # smallest keys together reach the best connection found, and the node
+        # of that connection is returned.
+        reverse_nodes = self.get_reverse_nodes()
+
+        assert self.workspace is not None
+        backward_workspace = self.reset_backward()
+        start = timer()
+        stats = self.stats
+        # Every side caches the potentials of the nodes it touches, so that
+        # resetting its workspace clears them.
+        if potential is not None:
+            forward_potentials = self.workspace.get_potentials()
+            backward_potentials = backward_workspace.get_potentials()
+        else:
+            forward_potentials = backward_potentials = list()
+
+        def key_potential(potentials: list, node: int) -> int | float:
+            if potential is None:
+                return 0
+            if potentials[node] is None:
+                stats.heuristic_evaluations += 1
+                potentials[node] = potential(node)
+            return potentials[node]
+
+        self.best_distances[origin] = 0
+        self.backward_distances[destination] = 0
+        self.workspace.touched.append(origin)
+        backward_workspace.touched.append(destination)
+        forward = (
+            self.heap,
+            self.nodes,
+            self.best_distances,
+            self.previous,
+            self.visited,
+            self.workspace.touched,
+            forward_potentials,
+            self.backward_distances,
+            1,
+        )
+        backward = (
+            list(),
+            reverse_nodes,
+            self.backward_distances,
+            self.backward_previous,
+            backward_workspace.visited,
+            backward_workspace.touched,
+            backward_potentials,
+            self.best_distances,
+            -1,
+        )
+        forward[0].append((key_potential(forward_potentials, origin), origin))
+        backward[0].append(
+            (-key_potential(backward_potentials, destination), destination)
+        )
+
+        self.start_loading_bar()
+        best_connection: int | float = INFINITY
+        meeting_node = origin if origin == destination else None
+        if meeting_node is not None:
+            best_connection = 0
+
+        pop, push = heappop, heappush
+        observe = self.current_observer()
+        observe_interval = self.observe_interval
+        next_observe = observe_interval if observe is not None else -1
+        forward_heap, backward_heap = forward[0], backward[0]
+        considered_nodes = relaxed_edges = stale_pops = 0
+        heap_pushes = 2
+        while forward_heap and backward_heap:
+            forward_key, backward_key = forward_heap[0][0], backward_heap[0][0]
+            if forward_key + backward_key >= best_connection:
+                break
+            (
+                heap,
+                graph,
+                distances,
+                previous,
+                visited,
+                touched,
+                potentials,
+                other_distances,
+                sign,
+            ) = (
+                forward if forward_key <= backward_key else backward
+            )
+
+            current_node = pop(heap)[1]
+            if visited[current_node]:
+                stale_pops += 1
+                continue
+            visited[current_node] = True
+            considered_nodes += 1
+            if considered_nodes == next_observe:
+                next_observe += observe_interval
+                observe(stats.settled + considered_nodes)
+
+            current_distance = distances[current_node]
+            offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+            first_edge, last_edge = offsets[current_node], offsets[current_node + 1]
+            relaxed_edges += last_edge - first_edge
+            for edge in range(first_edge, last_edge):
+                target = targets[edge]
+                distance = current_distance + weights[edge]
+                if distance < distances[target]:
+                    if distances[target] == INFINITY:
+                        touched.append(target)
+                    distances[target] = distance
+                    previous[target] = current_node
+                    heap_pushes += 1
+                    push(
+                        heap,
+                        (distance + sign * key_potential(potentials, target), target),
+                    )
+
+                    connection = distance + other_distances[target]
+                    if connection < best_connection:
+                        best_connection = connection
+                        meeting_node = target
+
+        stats.settled += considered_nodes
+        stats.relaxed_edges += relaxed_edges
+        stats.heap_pushes += heap_pushes
+        stats.stale_pops += stale_pops
+        self.close_loading_bar()
+        stats.search_time += timer() - start
+        return meeting_node
+
+    def get_bidirectional_path(self, meeting_node: int) -> list[Node]:
+        path = self.get_path(meeting_node)
+        start = timer()
+        current_node = meeting_node
+        while (current_node := self.backward_previous[current_node]) is not None:
+            path.append(self.nodes[current_node])
+        self.stats.path_time += timer() - start
+        return path
+
+    @query
+    def run_bidirectional_dijkstra(
+        self,
+        origin: Location,
+        destination: Location,
+        loading_desc: str = "Running bidirectional dijkstra...",
+    ) -> tuple[float | int, list[Node]]:
+        self.reset_common()
+        origin, destination = self.node_of(origin), self.node_of(destination)
+
+        self.origin, self.destination = origin, destination
+        self.loading_desc = loading_desc
+        meeting_node = self.bidirectional_search(origin, destination)
+
+        if meeting_node is None:
+            return INFINITY, [self.nodes[destination]]
+        return (
+            self.best_distances[meeting_node] + self.backward_distances[meeting_node],
+            self.get_bidirectional_path(meeting_node),
+        )
+
+    @query
+    def run_bidirectional_alt(
+        self,
+        origin: Location,
+        destination: Location,
+        loading_desc: str = "Running bidirectional alt...",
+    ) -> tuple[float | int, list[Node]]:
+        self.reset_common()
+        origin, destination = self.node_of(origin), self.node_of(destination)
+
+        self.origin, self.destination = origin, destination
+        self.loading_desc = loading_desc
+
+        # Average of the forward and backward landmark bounds. Unlike using
+        # each bound on its own side, this potential is consistent for both
+        # searches at once, which the stopping rule relies on.
+        to_destination = self.alt_estimate(destination)
+        from_origin = self.alt_estimate(origin, reverse=True)
+        meeting_node = self.bidirectional_search(
+            origin,
+            destination,
+            lambda node: (to_destination(node) - from_origin(node)) / 2,
+        )
+
+        if meeting_node is None:
+            return INFINITY, [self.nodes[destination]]
+        return (
+            self.best_distances[meeting_node] + self.backward_distances[meeting_node],
+            self.get_bidirectional_path(meeting_node),
+        )
+
+    @query
+    def run_ch(
+        self,
+        origin: Location,
+        destination: Location,
+        loading_desc: str = "Running contraction hierarchy query...",
+    ) -> tuple[float | int, list[Node]]:
+        if self.hierarchy is None:
+            raise ValueError("Contraction hierarchy queries need set_hierarchy")
+        hierarchy = self.hierarchy
+
+        self.reset_common()
+        origin, destination = self.node_of(origin), self.node_of(destination)
+        self.origin, self.destination = origin, destination
+        self.loading_desc = loading_desc
+
+        # Both searches only follow edges to higher ranked nodes, so neither
+        # can stop at the first meeting. A side is done once its smallest key
+        # reaches the best connection.
+        assert self.workspace is not None
+        backward_workspace = self.reset_backward()
+        start = timer()
+        stats = self.stats
+        self.best_distances[origin] = 0
+        self.backward_distances[destination] = 0
+        self.workspace.touched.append(origin)
+        backward_workspace.touched.append(destination)
+        forward = (
+            [(0, origin)],
+            (hierarchy.up_offsets, hierarchy.up_targets, hierarchy.up_weights),
+            self.best_distances,
+            self.previous,
+            self.visited,
+            self.workspace.touched,
+        )
+        backward = (
+            [(0, destination)],
+            (hierarchy.down_offsets, hierarchy.down_targets, hierarchy.down_weights),
+            self.backward_distances,
+            self.backward_previous,
+            backward_workspace.visited,
+            backward_workspace.touched,
+        )
+
+        self.start_loading_bar()
+        best_connection: int | float = INFINITY
+        meeting_node = None
+        pop, push = heappop, heappush
+        observe = self.current_observer()
+        observe_interval = self.observe_interval
+        next_observe = observe_interval if observe is not None else -1
+        considered_nodes = relaxed_edges = stale_pops = 0
+        heap_pushes = 2
+        while True:
+            forward_key = forward[0][0][0] if forward[0] else INFINITY
+            backward_key = backward[0][0][0] if backward[0] else INFINITY
+            if min(forward_key, backward_key) >= best_connection:
+                break
+            heap, (offsets, targets, weights), distances, previous, visited, touched = (
+                forward if forward_key <= backward_key else backward
+            )
+            other_distances = (
+                self.backward_distances
+                if distances is self.best_distances
+                else self.best_distances
+            )
+
+            current_distance, current_node = pop(heap)
+            if visited[current_node]:
+                stale_pops += 1
+                continue
+            visited[current_node] = True
+            considered_nodes += 1
+            if considered_nodes == next_observe:
+                next_observe += observe_interval
+                observe(stats.settled + considered_nodes)
+
+            connection = current_distance + other_distances[current_node]
+            if connection < best_connection:
+                best_connection = connection
+                meeting_node = current_node
+
+            first_edge, last_edge = offsets[current_node], offsets[current_node + 1]
+            relaxed_edges += last_edge - first_edge
+            for edge in range(first_edge, last_edge):
+                target = targets[edge]
+                distance = current_distance + weights[edge]
+                if distance < distances[target]:
+                    if distances[target] == INFINITY:
+                        touched.append(target)
+                    distances[target] = distance
+                    previous[target] = current_node
+                    heap_pushes += 1
+                    push(heap, (distance, target))
 
+        stats.settled += considered_nodes
+        stats.relaxed_edges += relaxed_edges
+        stats.heap_pushes += heap_pushes
+        stats.stale_pops += stale_pops
+        self.close_loading_bar()
+        stats.search_time += timer() - start
+
+        if meeting_node is None:
+            return INFINITY, [self.nodes[destination]]
+
+        start = timer()
+        up_path = [meeting_node]
+        while (current_node := self.previous[up_path[-1]]) is not None:
+            up_path.append(current_node)
+        up_path.reverse()
+        current_node = meeting_node
+        down_path = [meeting_node]
+        while (current_node := self.backward_previous[current_node]) is not None:
+            down_path.append(current_node)
+
+        path = [origin]
+        for hierarchy_path in (up_path, down_path):
+            for source, target in zip(hierarchy_path, hierarchy_path[1:]):
+                path += hierarchy.unpack(source, target)
+        nodes = [self.nodes[node] for node in path]
+        stats.path_time += timer() - start
+        return best_connection, nodes
+
+    def get_path(self, destination: int):
+        start = timer()
         current_node = destination
         reverse_path = [current_node]
 
         while (current_node := self.previous[current_node]) is not None:
             reverse_path.append(current_node)
 
-        return list(map(lambda n: self.nodes[n], reverse_path[::-1]))
+        path = list(map(lambda n: self.nodes[n], reverse_path[::-1]))
+        self.stats.path_time += timer() - start
+        return path
 
+    @query
     def run_dijkstra(
         self,
-        origin: int,
-        destination: Optional[int] = None,
+        origin: Location,
+        destination: Optional[Location] = None,
         loading_desc: str = "Running dijkstra...",
     ) -> tuple[Optional[int], Optional[list[Node]]]:
         self.reset_common()
-
-        self.loading_desc = loading_desc
-        self.best_distances[origin] = 0
-        self.heap.put((0, origin))
+        origin = self.node_of(origin)
+        if destination is not None:
+            destination = self.node_of(destination)
 
         self.origin, self.destination = origin, destination
         self.loading_desc = loading_desc
-
-        for consideration in self.find_next_considerations():
-            if len(consideration) == 2:
-                current_node, distance = consideration
-                assert current_node == destination
-                break
-            else:
-                current_node, target, distance = consideration
-
-            if distance < self.best_distances[target]:
-                self.best_distances[target] = distance
-                self.previous[target] = current_node
-                self.heap.put((distance, target))
-
-        if self.loading_bar:
-            self.current_loading_bar.close()
+        self.search(origin, destination)
 
         if destination is None:
             return None, None
         else:
             return self.best_distances[destination], self.get_path(destination)
 
+    @query
     def closest_n_nodes(
         self,
-        origin: int,
+        origin: Location,
         n: int,
-        predicate: Callable[[Node], bool],
+        predicate: Callable[[Node], bool] | int,
         loading_desc: str = "Finding n closest...",
-    ) -> list[tuple[Node, int]]:
+        goal_directed: bool = True,
+    ) -> list[tuple[int, int]]:
+        # predicate is either a function of a Node, or a mask of place type
+        # bits from categories. A function is called with a Node made for
+        # every settled node, so masks are much cheaper. With a mask, a table
+        # from set_nearest_places answers directly when it holds at least n
+        # places per node. Else the category index lets the search stop once
+        # every place of the categories is found, and with landmarks loaded
+        # and goal_directed set, the search is guided towards the places by a
+        # landmark bound.
         self.reset_common()
-
-        self.best_distances[origin] = 0
-        self.heap.put((0, origin))
+        origin = self.node_of(origin)
 
         self.origin = origin
         self.loading_desc = loading_desc
-        found_nodes: list[Node] = list()
+        if not isinstance(predicate, int):
+            return self.search(
+                origin,
+                target_predicate=lambda node: predicate(self.nodes[node]),
+                targets_wanted=n,
+            )
+
+        mask = predicate
+        table = self.nearest_places.get(mask)
+        if table is not None and n <= table.k:
+            return table.lookup(origin, n)
+
+        targets_wanted = min(n, self.get_category_index().count(mask))
+        if targets_wanted == 0:
+            return list()
+        # The bound costs more than it saves when places are all around the
+        # origin, which shows as no bound at the origin itself.
+        estimate = None
+        if goal_directed and self.from_landmarks:
+            estimate = self.category_estimate(mask)
+            if estimate(origin) == 0:
+                estimate = None
+
+        types = self.nodes.types
+        return self.search(
+            origin,
+            target_predicate=lambda node: types[node] & mask,
+            targets_wanted=targets_wanted,
+            estimate=estimate,
+        )
+
+    @query
+    def reachable_within(
+        self,
+        origin: Location,
+        budget: int,
+        boundary_file: Optional[str] = None,
+        loading_desc: str = "Finding reachable nodes...",
+    ) -> tuple[array, array]:
+        return self.reachable_within_any([origin], budget, boundary_file, loading_desc)
+
+    @query
+    def reachable_within_any(
+        self,
+        origins: Sequence[Location],
+        budget: int,
+        boundary_file: Optional[str] = None,
+        loading_desc: str = "Finding reachable nodes...",
+    ) -> tuple[array, array]:
+        # The nodes that can be reached from any of origins within budget
+        # centiseconds, and their distances, closest first. The search stops
+        # once the next node is past the budget. With boundary_file, the
+        # coordinates of the reachable nodes with an edge leaving the area
+        # are written to it, one "latitude,longitude" per line.
+        self.reset_common()
+        origins = [self.node_of(origin) for origin in origins]
+        self.origin = origins[0]
+        self.loading_desc = loading_desc
 
-        for consideration in self.find_next_considerations(
-            lambda n: predicate(self.nodes[n])
-        ):
-            if len(consideration) == 2:
-                current_node, distance = consideration
-                assert predicate(self.nodes[current_node])
-                found_nodes.append((current_node, distance))
-                if len(found_nodes) == n:
-                    break
-                continue
-            else:
-                current_node, target, distance = consideration
+        assert self.workspace is not None
+        touched = self.workspace.touched
+        for origin in origins[1:]:
+            if self.best_distances[origin] == INFINITY:
+                touched.append(origin)
+            self.best_distances[origin] = 0
+            self.heap.append((0, origin))
+            self.stats.heap_pushes += 1
+        self.search(origins[0], max_distance=budget)
+
+        visited, best_distances = self.visited, self.best_distances
+        reachable = sorted(
+            (node for node in touched if visited[node]),
+            key=best_distances.__getitem__,
+        )
+        nodes = array("i", reachable)
+        distances = array("i", [best_distances[node] for node in reachable])
 
-                if distance < self.best_distances[target]:
-                    self.best_distances[target] = distance
-                    self.previous[target] = current_node
-                    self.heap.put((distance, target))
+        if boundary_file is not None:
+            with open(boundary_file, "w") as f:
+                for node in self.isochrone_boundary(nodes):
+                    f.write(",".join(map(str, self.nodes[node].pos)) + "\n")
+        return nodes, distances
 
+    def isochrone_boundary(self, nodes: Sequence[int]) -> list[int]:
+        # The nodes of the last reachable_within query with an edge to a node
+        # outside of it.
+        visited = self.visited
+        offsets, targets = self.nodes.offsets, self.nodes.targets
+        return [
+            node
+            for node in nodes
+            if not all(
+                visited[target] for target in targets[offsets[node] : offsets[node + 1]]
+            )
+        ]
+
+    @query
+    def distance_matrix(
+        self,
+        sources: Sequence[Location],
+        targets: Sequence[Location],
+        paths: bool = False,
+        loading_desc: str = "Calculating distance matrix...",
+    ) -> tuple[list[list[int | float]], Optional[list[list[list[Node]]]]]:
+        # matrix[i][j] is the distance from sources[i] to targets[j], or
+        # INFINITY if there is no path. With a contraction hierarchy and no
+        # paths, the bucket based many-to-many algorithm is used. Otherwise
+        # there is one search per source, which stops once all targets are
+        # settled, and the paths are read from its tree when asked for.
+        sources = [self.node_of(source) for source in sources]
+        targets = [self.node_of(target) for target in targets]
+        bar = self.start_sources_bar(len(sources), loading_desc)
+        if self.hierarchy is not None and not paths:
+            self.stats = SearchStats()
+            start = timer()
+            matrix = self.ch_distance_matrix(sources, targets, bar)
+            self.stats.search_time = timer() - start
+            bar.close()
+            return matrix, None
+
+        # The per search loading bars are turned off while the matrix has its own.
+        loading_bar, self.loading_bar = self.loading_bar, False
+        self.loading_desc = ""
+        target_set = set(targets)
+        matrix = list()
+        matrix_paths: list[list[list[Node]]] = list()
+        stats = SearchStats()
+        for source in sources:
+            self.reset_common()
+            self.origin = source
+            self.search(
+                source,
+                target_predicate=target_set.__contains__,
+                targets_wanted=len(target_set),
+            )
+            matrix.append([self.best_distances[target] for target in targets])
+            if paths:
+                matrix_paths.append([self.get_path(target) for target in targets])
+            stats.add(self.stats)
+            bar.update(1)
+        self.loading_bar = loading_bar
+        self.stats = stats
+        bar.close()
+        return matrix, matrix_paths if paths else None
+
+    def start_sources_bar(self, number_of_sources: int, loading_desc: str):
         if self.loading_bar:
-            self.current_loading_bar.close()
-        return found_nodes
+            from tqdm import tqdm
+
+            return tqdm(total=number_of_sources, desc=loading_desc)
+        if loading_desc:
+            print(loading_desc)
+        return LoadingBarMocker()
+
+    def ch_distance_matrix(
+        self, sources: Sequence[int], targets: Sequence[int], bar: LoadingBarMocker
+    ) -> list[list[int | float]]:
+        # Every target leaves (target index, distance) in a bucket at each
+        # node of its backward search space. Each source then only needs its
+        # forward search space, where it combines with the buckets it meets.
+        hierarchy = self.hierarchy
+        assert hierarchy is not None
+
+        buckets: dict[int, list[tuple[int, int]]] = dict()
+        considered_nodes = 0
+        for j, target in enumerate(targets):
+            distances = upward_distances(
+                target,
+                hierarchy.down_offsets,
+                hierarchy.down_targets,
+                hierarchy.down_weights,
+            )
+            considered_nodes += len(distances)
+            for node, distance in distances.items():
+                buckets.setdefault(node, list()).append((j, distance))
+
+        matrix: list[list[int | float]] = list()
+        for source in sources:
+            row: list[int | float] = [INFINITY] * len(targets)
+            distances = upward_distances(
+                source,
+                hierarchy.up_offsets,
+                hierarchy.up_targets,
+                hierarchy.up_weights,
+            )
+            considered_nodes += len(distances)
+            for node, distance in distances.items():
+                for j, target_distance in buckets.get(node, ()):
+                    if distance + target_distance < row[j]:
+                        row[j] = distance + target_distance
+            matrix.append(row)
+            bar.update(1)
+
+        self.considered_nodes = considered_nodes
+        return matrix
+
+    def alt_estimate(
+        self, destination: int, reverse: bool = False
+    ) -> Callable[[int], int]:
+        # Lower bound of the distance from a node to destination, or from
+        # destination to a node when reverse is set. Landmarks that can not
+        # reach, or be reached from, either node give no bound and are skipped.
+        from_landmarks, to_landmarks = self.from_landmarks, self.to_landmarks
+        if reverse:
+            from_landmarks, to_landmarks = to_landmarks, from_landmarks
+
+        return landmark_estimate(
+            *landmark_terms(destination, from_landmarks, to_landmarks)
+        )
 
+    @query
     def run_alt(
         self,
-        origin,
-        destination,
+        origin: Location,
+        destination: Location,
         to_landmarks: Optional[Preprocess] = None,
         from_landmarks: Optional[Preprocess] = None,
         loading_desc: str = "Running alt...",
+        active_landmarks: Optional[int] = None,
+        reselect_interval: int = 100,
+        estimate_mode: str = "lazy",
     ) -> tuple[float | int, list[Node]]:
+        # estimate_mode picks how landmark estimates are computed: "lazy" in
+        # Python per node when first seen, or "eager" with NumPy for the whole
+        # graph before the search starts.
         if to_landmarks is not None:
             self.to_landmarks = to_landmarks
+            self.clear_landmark_caches()
         if from_landmarks is not None:
             self.from_landmarks = from_landmarks
+            self.clear_landmark_caches()
 
         self.reset_common()
-
-        self.best_distances[origin] = 0
-        self.heap.put((0, origin))
-        node_to_goal_estimate: list[float | int] = [INFINITY] * len(self.nodes)
+        origin, destination = self.node_of(origin), self.node_of(destination)
 
         self.origin, self.destination = origin, destination
         self.loading_desc = loading_desc
+        if estimate_mode not in ("lazy", "eager"):
+            raise ValueError(f"Unknown estimate mode {estimate_mode}")
+        if active_landmarks is not None and estimate_mode != "lazy":
+            raise ValueError("Active landmarks only work with lazy estimates")
 
-        for consideration in self.find_next_considerations():
-            if len(consideration) == 2:
-                current_node, distance = consideration
-                assert current_node == destination
-                break
-            else:
-                current_node, target, distance = consideration
-
-            # Calculate node to goal estimate
-            if node_to_goal_estimate[target] is INFINITY:
-                from_estimate = max(
-                    from_landmark[destination] - from_landmark[target]
-                    for from_landmark in self.from_landmarks
-                )
-                to_estimate = max(
-                    to_landmark[target] - to_landmark[destination]
-                    for to_landmark in self.to_landmarks
-                )
-                node_to_goal_estimate[target] = max(0, from_estimate, to_estimate)
+        if estimate_mode == "eager":
+            assert self.workspace is not None
+            estimates = self.workspace.get_bulk_estimates()
+            self.get_landmark_matrix().all_estimates(destination, estimates)
+            self.search(
+                origin,
+                destination,
+                estimate=estimates.__getitem__,
+                estimates=estimates,
+            )
+        elif active_landmarks is None:
+            self.search(origin, destination, estimate=self.alt_estimate(destination))
+        else:
+            active = ActiveLandmarks(
+                *landmark_terms(destination, self.from_landmarks, self.to_landmarks),
+                origin,
+                active_landmarks,
+            )
+            self.search(
+                origin,
+                destination,
+                estimate=active,
+                reselect=active.reselect,
+                reselect_interval=reselect_interval,
+            )
 
-            if distance < self.best_distances[target]:
-                self.best_distances[target] = distance
-                self.previous[target] = current_node
-                self.heap.put(
-                    (distance + node_to_goal_estimate[target], distance, target)
-                )
+        return (self.best_distances[destination], self.get_path(destination))
+
+    @query
+    def run_astar(
+        self,
+        origin: Location,
+        destination: Location,
+        loading_desc: str = "Running A*...",
+        estimate_mode: str = "lazy",
+    ) -> tuple[float | int, list[Node]]:
+        # A* with the great-circle bound, for maps without landmarks.
+        # estimate_mode is "lazy" to compute the bound in Python per node
+        # when first seen, or "eager" with NumPy for the whole graph before
+        # the search starts.
+        self.reset_common()
+        origin, destination = self.node_of(origin), self.node_of(destination)
+
+        self.origin, self.destination = origin, destination
+        self.loading_desc = loading_desc
+        if estimate_mode not in ("lazy", "eager"):
+            raise ValueError(f"Unknown estimate mode {estimate_mode}")
+
+        bound = self.get_geographic_bound()
+        if estimate_mode == "eager":
+            assert self.workspace is not None
+            estimates = self.workspace.get_bulk_estimates()
+            bound.all_estimates(destination, estimates)
+            self.search(
+                origin,
+                destination,
+                estimate=estimates.__getitem__,
+                estimates=estimates,
+            )
+        else:
+            self.search(origin, destination, estimate=bound.estimate(destination))
 
-        if self.loading_bar:
-            self.current_loading_bar.close()
         return (self.best_distances[destination], self.get_path(destination))
@@ -0,0 +1,58 @@
+from heapq import heapify, heappop, heappush
+
+# Keys are compared to the last popped key by the highest differing bit, so
+# 64 bit keys need 65 buckets.
+BUCKETS = 65
+
+
+class RadixHeap:
+    # Monotone priority queue of (key, node) items with non negative integer
+    # keys, for searches that rarely push a key smaller than the last popped
+    # key. That holds for Dijkstra, and for A* with a consistent integer
+    # estimate.
+    #
+    # Bucket i holds the items whose key first differs from the last popped
+    # key at bit i - 1. Popping from an empty bucket 0 moves the items of the
+    # lowest non empty bucket down, and each item moves at most once per
+    # bit. Bucket 0 holds the items with the last popped key, or a smaller
+    # one, and is kept as a binary heap, so it always holds the smallest
+    # items. The order of pops is then the same as with heapq.
+    buckets: list[list[tuple[int, int]]]
+    last: int
+    size: int
+
+    def __init__(self) -> None:
+        self.buckets = [list() for _ in range(BUCKETS)]
+        self.last = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def radix_push(queue: RadixHeap, item: tuple[int, int]):
+    # The same signature as heapq.heappush, so search loops can take either.
+    queue.size += 1
+    last = queue.last
+    if item[0] > last:
+        queue.buckets[(item[0] ^ last).bit_length()].append(item)
+    else:
+        # ALT estimates skip landmarks that can not be reached, so they are
+        # not consistent at dead ends and can go below the last key.
+        heappush(queue.buckets[0], item)
+
+
+def radix_pop(queue: RadixHeap) -> tuple[int, int]:
+    buckets = queue.buckets
+    queue.size -= 1
+    if not buckets[0]:
+        index = 1
+        while not buckets[index]:
+            index += 1
+        bucket = buckets[index]
+        buckets[index] = list()
+        last = queue.last = min(bucket)[0]
+        for item in bucket:
+            buckets[(item[0] ^ last).bit_length()].append(item)
+        heapify(buckets[0])
+    return heappop(buckets[0])
@@ -0,0 +1,308 @@
+from alt_preprocess import load_preprocess
+from categories import CATEGORIES, category_mask
+from file_handling import read_complete
+from pathfinding import INFINITY, Location, PathFinder, SearchStats
+from spatial_index import read_spatial_index
+from utils import Node, cs_to_hour_min_sec
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlsplit
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import traceback
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+# Most places a /closest query can ask for.
+MAX_PLACES = 100
+
+Query = tuple[Any, ...]
+
+# Search state of a service worker process.
+worker_pathfinder: Optional[PathFinder] = None
+
+
+def init_worker(node_file: str, edges_file: str, place_file: str, landmark_file: str):
+    # The graph cache and the landmark file are mapped read only, so they are
+    # loaded once per worker, and every worker shares the same pages. Maps
+    # without a landmark file are routed with A* on the great-circle bound,
+    # which is found here instead of in the first query.
+    global worker_pathfinder
+    graph = read_complete(node_file, edges_file, place_file)
+    worker_pathfinder = PathFinder(graph)
+    if os.path.exists(landmark_file):
+        worker_pathfinder.set_preprocess(*load_preprocess(landmark_file))
+    else:
+        worker_pathfinder.get_geographic_bound()
+    worker_pathfinder.set_spatial_index(
+        read_spatial_index(node_file, edges_file, graph)
+    )
+
+
+def worker_ready() -> bool:
+    return worker_pathfinder is not None
+
+
+def time_string(distance: float | int) -> Optional[str]:
+    if distance == INFINITY:
+        return None
+    return "{}:{}:{}".format(*cs_to_hour_min_sec(distance))
+
+
+def route(
+    pathfinder: PathFinder, origin: Location, destination: Location
+) -> tuple[tuple[float | int, list[Node]], SearchStats]:
+    if pathfinder.from_landmarks:
+        return pathfinder.run_alt(origin, destination, loading_desc="", stats=True)
+    return pathfinder.run_astar(origin, destination, loading_desc="", stats=True)
+
+
+def worker_query(query: Query) -> dict[str, Any]:
+    assert worker_pathfinder is not None
+    pathfinder = worker_pathfinder
+    kind, *arguments = query
+    if kind == "route":
+        origin, destination = arguments
+        (distance, path), stats = route(pathfinder, origin, destination)
+        reachable = distance != INFINITY
+        return {
+            "distance": distance if reachable else None,
+            "time": time_string(distance),
+            "nodes evaluated": stats.settled,
+            "path": [node.pos for node in path] if reachable else [],
+        }
+    if kind == "distance":
+        origin, destination = arguments
+        (distance, _), _ = route(pathfinder, origin, destination)
+        return {
+            "distance": distance if distance != INFINITY else None,
+            "time": time_string(distance),
+        }
+    if kind == "closest":
+        origin, n, mask = arguments
+        found = pathfinder.closest_n_nodes(origin, n, mask, loading_desc="")
+        return {
+            "nodes": [
+                {
+                    "node": node,
+                    "name": pathfinder.nodes.names.get(node),
+                    "pos": pathfinder.nodes.pos(node),
+                    "distance": distance,
+                    "time": time_string(distance),
+                }
+                for node, distance in found
+            ]
+        }
+    raise ValueError(f"Unknown query {kind}")
+
+
+class RequestError(Exception):
+    status: int
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class RoutingService:
+    # Answers queries over HTTP with a warm graph in worker processes. The
+    # event loop only parses requests; every search runs in the executor.
+    # Identical queries that arrive while one is running share its result,
+    # and queries beyond max_queue are turned away with 503.
+    number_of_nodes: int
+    executor: ProcessPoolExecutor
+    max_queue: int
+    in_flight: dict[Query, "asyncio.Future[dict[str, Any]]"]
+
+    def __init__(
+        self,
+        node_file: str,
+        edges_file: str,
+        place_file: str,
+        landmark_file: str,
+        workers: int = 1,
+        max_queue: int = 64,
+    ) -> None:
+        # Also makes sure the graph cache and spatial index exist before the
+        # workers open them.
+        graph = read_complete(node_file, edges_file, place_file)
+        read_spatial_index(node_file, edges_file, graph)
+        self.number_of_nodes = len(graph)
+        # Forked workers would inherit the sockets open when they start, and
+        # keep those connections from closing, so they are spawned instead.
+        # Waiting for a worker_ready per worker starts workers before the
+        # service listens, but one worker may answer several of them, so
+        # others can still be loading. The initializer loads every worker
+        # before its first query, so that only delays the first query.
+        self.executor = ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(node_file, edges_file, place_file, landmark_file),
+        )
+        for future in [self.executor.submit(worker_ready) for _ in range(workers)]:
+            future.result()
+        self.max_queue = max_queue
+        self.in_flight = dict()
+
+    def node(self, parameters: dict[str, list[str]], name: str) -> Location:
+        # A node number, or latitude,longitude which the worker snaps to the
+        # closest node.
+        try:
+            value = parameters[name][0]
+            if "," in value:
+                latitude, longitude = map(float, value.split(","))
+                if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                    raise ValueError
+                return latitude, longitude
+            node = int(value)
+        except (KeyError, ValueError):
+            raise RequestError(
+                400, f"{name} must be a node number or latitude,longitude"
+            )
+        if not 0 <= node < self.number_of_nodes:
+            raise RequestError(
+                400, f"{name} must be from 0 to {self.number_of_nodes - 1}"
+            )
+        return node
+
+    def parse_query(self, target: str) -> Query:
+        url = urlsplit(target)
+        parameters = parse_qs(url.query)
+        if url.path in ("/route", "/distance"):
+            return (
+                url.path[1:],
+                self.node(parameters, "origin"),
+                self.node(parameters, "destination"),
+            )
+        if url.path == "/closest":
+            # Several categories are given comma separated, as in charging,gas
+            try:
+                mask = category_mask(parameters.get("category", ["eating"])[0])
+            except ValueError:
+                raise RequestError(
+                    400, f"category must be among {', '.join(CATEGORIES)}"
+                )
+            try:
+                n = int(parameters.get("n", ["8"])[0])
+                if not 1 <= n <= MAX_PLACES:
+                    raise ValueError
+            except ValueError:
+                raise RequestError(400, f"n must be a number from 1 to {MAX_PLACES}")
+            return ("closest", self.node(parameters, "origin"), n, mask)
+        raise RequestError(404, f"Unknown path {url.path}")
+
+    async def answer(self, query: Query) -> dict[str, Any]:
+        if query in self.in_flight:
+            return await asyncio.shield(self.in_flight[query])
+        if len(self.in_flight) >= self.max_queue:
+            raise RequestError(503, "Too many queries in the queue")
+
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, worker_query, query
+        )
+        self.in_flight[query] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self.in_flight.get(query) is future:
+                del self.in_flight[query]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # The connection is closed however the query ends. Errors that are
+        # not the client's, like a crashed worker, are answered with 500.
+        status, body = 200, None
+        try:
+            try:
+                request_line = (await reader.readline()).decode("latin-1").split()
+                while (await reader.readline()).strip():
+                    pass  # Headers are not used
+                if len(request_line) != 3:
+                    raise RequestError(400, "Malformed request")
+                method, target, _ = request_line
+                if method != "GET":
+                    raise RequestError(405, "Only GET is supported")
+                body = await self.answer(self.parse_query(target))
+            except RequestError as e:
+                status, body = e.status, {"error": str(e)}
+            except (ConnectionError, asyncio.IncompleteReadError):
+                return
+            except Exception:
+                traceback.print_exc()
+                status, body = 500, {"error": "Internal error"}
+
+            data = json.dumps(body).encode()
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(
+        self, host: str = "127.0.0.1", port: int = 8080, path: Optional[str] = None
+    ):
+        # Listens on a Unix socket when path is given, else on host and port.
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path)
+            print(f"Listening on {path}")
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            print(f"Listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown()
+
+
+if __name__ == "__main__":
+    files = {
+        "island": (
+            "island_noder.txt",
+            "island_kanter.txt",
+            "island_interessepkt.txt",
+            "island_preprocess.landmarks",
+        ),
+        "skandinavia": (
+            "noder.txt",
+            "kanter.txt",
+            "interessepkt.txt",
+            "preprocess.landmarks",
+        ),
+    }
+
+    try:
+        chosen_files = files[sys.argv[1]]
+        address = sys.argv[2] if len(sys.argv) > 2 else "8080"
+        workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 1
+    except Exception:
+        print("You must specify the map you want to serve.")
+        print(f"Choices: ({','.join(files.keys())}) [port | unix socket] [workers]")
+        sys.exit(1)
+
+    service = RoutingService(*chosen_files, workers=workers)
+    try:
+        if address.isdigit():
+            asyncio.run(service.serve(port=int(address)))
+        else:
+            asyncio.run(service.serve(path=address))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
@@ -0,0 +1,329 @@
+from array import array
+from graph import Graph, zeros
+from graph_cache import Stamp, padding, source_stamp, write_section
+from heapq import heappush, heappushpop
+from math import ceil, cos, floor, radians, sqrt
+from typing import Optional
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"PFGRID\0\0"
+VERSION = 1
+HEADER = struct.Struct("=8sI3dqqqq4q")
+HEADER_SIZE = 128
+
+# Meters per degree of latitude.
+DEGREE = 111_195
+
+# Average number of nodes per cell when the cell size is not given.
+NODES_PER_CELL = 4
+
+
+def index_file_name(node_file: str) -> str:
+    return f"{os.path.splitext(node_file)[0]}.grid"
+
+
+class SpatialIndex:
+    # Uniform grid over the coordinates of the nodes with edges leaving them.
+    # The nodes of cell (row, column) are stored at
+    # cell_nodes[cell_offsets[cell]:cell_offsets[cell + 1]] with
+    # cell = row * columns + column, like the edges of Graph. Distances are
+    # equirectangular around the latitude of the query, which is exact enough
+    # for snapping.
+    latitudes: array | memoryview
+    longitudes: array | memoryview
+    min_latitude: float
+    min_longitude: float
+    cell_size: float
+    rows: int
+    columns: int
+    cell_offsets: array | memoryview
+    cell_nodes: array | memoryview
+
+    def __init__(
+        self,
+        graph: Graph,
+        min_latitude: float,
+        min_longitude: float,
+        cell_size: float,
+        rows: int,
+        columns: int,
+        cell_offsets: array | memoryview,
+        cell_nodes: array | memoryview,
+    ) -> None:
+        assert len(cell_offsets) == rows * columns + 1
+        self.latitudes = graph.latitudes
+        self.longitudes = graph.longitudes
+        self.min_latitude = min_latitude
+        self.min_longitude = min_longitude
+        self.cell_size = cell_size
+        self.rows = rows
+        self.columns = columns
+        self.cell_offsets = cell_offsets
+        self.cell_nodes = cell_nodes
+
+    def __len__(self) -> int:
+        return len(self.cell_nodes)
+
+    def cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        # The cell a point falls in, clamped to the grid.
+        row = floor((latitude - self.min_latitude) / self.cell_size)
+        column = floor((longitude - self.min_longitude) / self.cell_size)
+        return (
+            min(max(row, 0), self.rows - 1),
+            min(max(column, 0), self.columns - 1),
+        )
+
+    def nearest(
+        self, latitude: float, longitude: float, k: int = 1
+    ) -> list[tuple[int, float]]:
+        # The k closest nodes as (node, distance in meters), closest first.
+        # The rings of cells around the cell of the point are searched
+        # outwards until no node outside them can be closer than the k found.
+        scale = cos(radians(latitude))
+        latitudes, longitudes = self.latitudes, self.longitudes
+        cell_offsets, cell_nodes = self.cell_offsets, self.cell_nodes
+        rows, columns, size = self.rows, self.columns, self.cell_size
+        center_row, center_column = self.cell(latitude, longitude)
+
+        # Max heap of the k best as (-squared distance, node).
+        best: list[tuple[float, int]] = list()
+        ring = 0
+        while True:
+            top, bottom = center_row - ring, center_row + ring
+            left, right = center_column - ring, center_column + ring
+            for row in range(max(top, 0), min(bottom, rows - 1) + 1):
+                if row == top or row == bottom:
+                    row_columns = range(max(left, 0), min(right, columns - 1) + 1)
+                else:
+                    row_columns = [c for c in (left, right) if 0 <= c < columns]
+                for column in row_columns:
+                    cell = row * columns + column
+                    for node in cell_nodes[cell_offsets[cell] : cell_offsets[cell + 1]]:
+                        dy = latitudes[node] - latitude
+                        dx = (longitudes[node] - longitude) * scale
+                        key = (-(dy * dy + dx * dx), node)
+                        if len(best) < k:
+                            heappush(best, key)
+                        elif key > best[0]:
+                            heappushpop(best, key)
+
+            # Every node not yet seen lies past one of the sides of the
+            # searched square that are inside the grid.
+            gaps = list()
+            if top > 0:
+                gaps.append(latitude - (self.min_latitude + top * size))
+            if bottom < rows - 1:
+                gaps.append(self.min_latitude + (bottom + 1) * size - latitude)
+            if left > 0:
+                gaps.append((longitude - (self.min_longitude + left * size)) * scale)
+            if right < columns - 1:
+                gaps.append(
+                    (self.min_longitude + (right + 1) * size - longitude) * scale
+                )
+            if not gaps:
+                break
+            bound = max(min(gaps), 0)
+            if len(best) == k and bound * bound >= -best[0][0]:
+                break
+            ring += 1
+
+        return [
+            (node, sqrt(-negative) * DEGREE)
+            for negative, node in sorted(best, reverse=True)
+        ]
+
+    def snap(self, latitude: float, longitude: float) -> int:
+        return self.nearest(latitude, longitude)[0][0]
+
+
+def build_index(graph: Graph, cell_size: Optional[float] = None) -> SpatialIndex:
+    # Only nodes with edges leaving them are indexed, as a route can not start
+    # from the others.
+    print("Building spatial index...")
+    offsets = graph.offsets
+    nodes = [node for node in range(len(graph)) if offsets[node] != offsets[node + 1]]
+    if not nodes:
+        raise ValueError("The graph has no edges to index")
+    nodes_latitudes = [graph.latitudes[node] for node in nodes]
+    nodes_longitudes = [graph.longitudes[node] for node in nodes]
+    min_latitude, min_longitude = min(nodes_latitudes), min(nodes_longitudes)
+    height = max(nodes_latitudes) - min_latitude
+    width = max(nodes_longitudes) - min_longitude
+    if cell_size is None:
+        # NODES_PER_CELL nodes per cell on average, but with cells no smaller
+        # than the longest side over the number of nodes. Nodes on a line
+        # have no area, and would else get more cells than there are nodes.
+        cell_size = max(
+            sqrt(height * width * NODES_PER_CELL / len(nodes)),
+            max(height, width) / len(nodes),
+        )
+        if cell_size == 0:
+            # All the nodes are at one point.
+            cell_size = 1.0
+    rows = max(ceil(height / cell_size), 1)
+    columns = max(ceil(width / cell_size), 1)
+
+    cells = array(
+        "q",
+        (
+            min(floor((node_latitude - min_latitude) / cell_size), rows - 1) * columns
+            + min(floor((node_longitude - min_longitude) / cell_size), columns - 1)
+            for node_latitude, node_longitude in zip(nodes_latitudes, nodes_longitudes)
+        ),
+    )
+
+    cell_offsets = zeros("q", rows * columns + 1)
+    for cell in cells:
+        cell_offsets[cell + 1] += 1
+    for i in range(rows * columns):
+        cell_offsets[i + 1] += cell_offsets[i]
+
+    next_position = cell_offsets[:-1]
+    cell_nodes = zeros("i", len(nodes))
+    for node, cell in zip(nodes, cells):
+        cell_nodes[next_position[cell]] = node
+        next_position[cell] += 1
+
+    return SpatialIndex(
+        graph,
+        min_latitude,
+        min_longitude,
+        cell_size,
+        rows,
+        columns,
+        cell_offsets,
+        cell_nodes,
+    )
+
+
+def save_index(index: SpatialIndex, file_name: str, stamp: Stamp):
+    temporary_file_name = f"{file_name}.tmp"
+    with open(temporary_file_name, "wb") as f:
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                index.min_latitude,
+                index.min_longitude,
+                index.cell_size,
+                index.rows,
+                index.columns,
+                len(index.latitudes),
+                len(index),
+                *stamp,
+            ).ljust(HEADER_SIZE, b"\0")
+        )
+        write_section(f, index.cell_offsets)
+        write_section(f, index.cell_nodes)
+    os.replace(temporary_file_name, file_name)
+
+
+def load_index(file_name: str, graph: Graph, stamp: Stamp) -> Optional[SpatialIndex]:
+    # None when the file is missing, or not made from the same sources.
+    if not os.path.exists(file_name):
+        return None
+
+    with open(file_name, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            return None
+
+    if len(buffer) < HEADER_SIZE:
+        return None
+    (
+        magic,
+        version,
+        min_latitude,
+        min_longitude,
+        cell_size,
+        rows,
+        columns,
+        number_of_nodes,
+        indexed_nodes,
+        *file_stamp,
+    ) = HEADER.unpack_from(buffer)
+    if (
+        magic != MAGIC
+        or version != VERSION
+        or tuple(file_stamp) != stamp
+        or number_of_nodes != len(graph)
+    ):
+        return None
+
+    offsets_size = (rows * columns + 1) * 8
+    nodes_size = indexed_nodes * 4
+    offsets_start = HEADER_SIZE
+    nodes_start = offsets_start + offsets_size + padding(offsets_size)
+    if nodes_start + nodes_size > len(buffer):
+        return None
+
+    view = memoryview(buffer)
+    return SpatialIndex(
+        graph,
+        min_latitude,
+        min_longitude,
+        cell_size,
+        rows,
+        columns,
+        view[offsets_start : offsets_start + offsets_size].cast("q"),
+        view[nodes_start : nodes_start + nodes_size].cast("i"),
+    )
+
+
+def read_spatial_index(
+    node_file: str, edges_file: str, graph: Graph, use_cache: bool = True
+) -> SpatialIndex:
+    # The index of the forward graph, from the .grid file next to the graph
+    # cache when it is up to date, else built and saved there.
+    if not use_cache:
+        return build_index(graph)
+
+    file_name = index_file_name(node_file)
+    stamp = source_stamp(node_file, edges_file)
+    index = load_index(file_name, graph, stamp)
+    if index is not None:
+        print(f"Read spatial index from {file_name}")
+        return index
+
+    index = build_index(graph)
+    print(f"Writing spatial index to {file_name}...")
+    save_index(index, file_name, stamp)
+    return index
+
+
+if __name__ == "__main__":
+    from file_handling import read_complete
+
+    files = {
+        "island": (
+            "island_noder.txt",
+            "island_kanter.txt",
+            "island_interessepkt.txt",
+        ),
+        "skandinavia": (
+            "noder.txt",
+            "kanter.txt",
+            "interessepkt.txt",
+        ),
+    }
+
+    try:
+        chosen_files = files[sys.argv[1]]
+        point = None
+        if len(sys.argv) > 2:
+            point = tuple(map(float, sys.argv[2].split(",")))
+            assert len(point) == 2
+    except Exception:
+        print("You must specify the map to index, and optionally a point to snap.")
+        print(f"Choices: ({','.join(files.keys())}) [latitude,longitude]")
+        sys.exit(1)
+
+    graph = read_complete(*chosen_files)
+    index = read_spatial_index(chosen_files[0], chosen_files[1], graph)
+    if point is not None:
+        for node, meters in index.nearest(*point, k=5):
+            print(f"{node:>10} {graph.pos(node)} {meters:.0f}m")
@@ -62,7 +62,7 @@ if __name__ == "__main__":
         "noder.txt",
         "kanter.txt",
         "interessepkt.txt",
-        "preprocess.csv",
+        "preprocess.landmarks",
     )
     loading_bar = False
 
@@ -80,9 +80,7 @@ if __name__ == "__main__":
             node_file, edges_file, place_file, loading_bar=loading_bar
         )
         pathfinder = PathFinder(nodes, loading_bar)
-        to_landmarks, from_landmarks = load_preprocess(
-            preprocess_file, loading_bar=loading_bar
-        )
+        to_landmarks, from_landmarks = load_preprocess(preprocess_file)
         pathfinder.set_preprocess(to_landmarks, from_landmarks)
 
     _vars = vars().copy()
@@ -48,7 +48,7 @@ if __name__ == "__main__":
         "island_noder.txt",
         "island_kanter.txt",
         "island_interessepkt.txt",
-        "island_preprocess.csv",
+        "island_preprocess.landmarks",
     )
     loading_bar = False
 
@@ -66,9 +66,7 @@ if __name__ == "__main__":
             node_file, edges_file, place_file, loading_bar=loading_bar
         )
         pathfinder = PathFinder(nodes, loading_bar)
-        to_landmarks, from_landmarks = load_preprocess(
-            preprocess_file, loading_bar=loading_bar
-        )
+        to_landmarks, from_landmarks = load_preprocess(preprocess_file)
         pathfinder.set_preprocess(to_landmarks, from_landmarks)
 
     _vars = vars().copy()
@@ -0,0 +1,85 @@
+from pathfinding import PathFinder
+from file_handling import read_complete
+from utils import Node
+
+
+def path_distance(path: list[Node]) -> int:
+    # Length of the path along its shortest edges.
+    return sum(
+        min(weight for target, weight in node.edges if target == next_node.number)
+        for node, next_node in zip(path, path[1:])
+    )
+
+
+def general_test(
+    pathfinder: PathFinder, origin: int, destination: int, estimate_mode: str
+):
+    # Dijkstra uses no bound, so its distance is the shortest one. A* only
+    # finds it when the bound never overestimates, and a too high speed
+    # estimate or a slip in the radians, chunking or NumPy path of the eager
+    # mode would make it stop on a longer path. So both modes are checked
+    # against Dijkstra rather than against each other, which could agree on
+    # the same wrong answer. Shortest paths of the same length may differ, so
+    # the path is checked to lead from origin to destination with the
+    # distance found.
+    target_distance, _ = pathfinder.run_dijkstra(origin, destination)
+    distance, path = pathfinder.run_astar(
+        origin, destination, estimate_mode=estimate_mode
+    )
+
+    assert distance == target_distance, f"{distance=}, {target_distance=}"
+    assert path[0].number == origin and path[-1].number == destination, "wrong ends"
+    assert path_distance(path) == distance, f"{path_distance(path)=}, {distance=}"
+
+
+def test_zero_ten_thousand():
+    general_test(pathfinder, 0, 10000, "lazy")
+
+
+def test_ten_thousand_zero():
+    general_test(pathfinder, 10000, 0, "lazy")
+
+
+def test_500_20000():
+    general_test(pathfinder, 500, 20000, "lazy")
+
+
+def test_20000_500():
+    general_test(pathfinder, 20000, 500, "lazy")
+
+
+def test_zero_ten_thousand_eager():
+    general_test(pathfinder, 0, 10000, "eager")
+
+
+def test_ten_thousand_zero_eager():
+    general_test(pathfinder, 10000, 0, "eager")
+
+
+def test_500_20000_eager():
+    general_test(pathfinder, 500, 20000, "eager")
+
+
+def test_20000_500_eager():
+    general_test(pathfinder, 20000, 500, "eager")
+
+
+if __name__ == "__main__":
+    loading_bar = False
+    nodes = read_complete(
+        "island_noder.txt",
+        "island_kanter.txt",
+        "island_interessepkt.txt",
+        loading_bar=loading_bar,
+    )
+    pathfinder = PathFinder(nodes, loading_bar)
+
+    _vars = vars().copy()
+    for name, value in _vars.items():
+        if name.startswith("test_"):
+            print(name)
+            try:
+                value()
+            except AssertionError as e:
+                print("Exception!")
+                print(str(e))
@@ -0,0 +1,112 @@
+from alt_preprocess import ICELAND_LANDMARKS, preprocess_and_save
+from batch import init_worker, run_batch
+import batch
+import mmap
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+
+files = ("island_noder.txt", "island_kanter.txt", "island_interessepkt.txt")
+
+# Lines a pairs file can have that are not queries.
+BAD_LINES = ["# origin destination", "", "5", "a b", "1 -2", "3 100000000"]
+
+
+def write_pairs(file_name: str, pairs: list[tuple[int, int]]):
+    # The pairs with bad lines mixed in between them.
+    with open(file_name, "w") as f:
+        for i, (origin, destination) in enumerate(pairs):
+            if i % 5 == 0:
+                f.write(BAD_LINES[(i // 5) % len(BAD_LINES)] + "\n")
+            f.write(f"{origin} {destination}\n")
+
+
+def expected_lines(pairs: list[tuple[int, int]]) -> list[str]:
+    # The output of the pairs run with run_alt in this process.
+    lines = list()
+    for origin, destination in pairs:
+        (distance, path), stats = pathfinder.run_alt(
+            origin, destination, loading_desc="", stats=True
+        )
+        fields = (origin, destination, distance, len(path), stats.settled)
+        lines.append(",".join(map(str, fields)))
+    return lines
+
+
+def general_test(workers: int, chunksize: int):
+    output_file = os.path.join(directory, f"output_{workers}_{chunksize}.csv")
+    queries = run_batch(
+        *copies, landmark_file, pairs_file, output_file, workers, chunksize
+    )
+    with open(output_file) as f:
+        lines = f.read().splitlines()[1:]
+    assert queries == len(pairs), f"{queries=}, {len(pairs)=}"
+    assert lines == expected, f"{workers=}, {chunksize=}: output differs"
+
+
+def is_mapped(view) -> bool:
+    return isinstance(view, memoryview) and isinstance(view.obj, mmap.mmap)
+
+
+def worker_maps() -> tuple[bool, bool]:
+    # Whether the graph and landmarks of this worker are views of mapped files.
+    pathfinder = batch.worker_pathfinder
+    assert pathfinder is not None
+    graph = pathfinder.nodes
+    return (
+        all(is_mapped(view) for view in (graph.offsets, graph.targets, graph.weights)),
+        all(is_mapped(table) for table in pathfinder.to_landmarks),
+    )
+
+
+def test_one_worker():
+    general_test(1, 64)
+
+
+def test_workers_in_order():
+    # Small chunks, so many are in flight and finish out of order.
+    general_test(3, 4)
+
+
+def test_workers_share_mapped_files():
+    with multiprocessing.Pool(
+        2, initializer=init_worker, initargs=(*copies, landmark_file)
+    ) as pool:
+        for graph_mapped, landmarks_mapped in pool.starmap(worker_maps, [()] * 4):
+            assert graph_mapped, "the graph of a worker is not mapped"
+            assert landmarks_mapped, "the landmarks of a worker are not mapped"
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    copies = tuple(shutil.copy(file_name, directory) for file_name in files)
+    landmark_file = os.path.join(directory, "island_preprocess.landmarks")
+    pathfinder = preprocess_and_save(
+        *copies, landmark_file, dict(list(ICELAND_LANDMARKS.items())[:2]), False
+    )
+    generator = random.Random(2023)
+    pairs = [
+        (
+            generator.randrange(len(pathfinder.nodes)),
+            generator.randrange(len(pathfinder.nodes)),
+        )
+        for _ in range(60)
+    ]
+    pairs_file = os.path.join(directory, "pairs.txt")
+    write_pairs(pairs_file, pairs)
+    expected = expected_lines(pairs)
+
+    _vars = vars().copy()
+    try:
+        for name, value in _vars.items():
+            if name.startswith("test_"):
+                print(name)
+                try:
+                    value()
+                except AssertionError as e:
+                    print("Exception!")
+                    print(str(e))
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,76 @@
+from alt_preprocess import ICELAND_LANDMARKS, preprocess
+from categories import CHARGING_STATION, EATING_PLACE, PLACENAME, CategoryIndex
+from pathfinding import PathFinder
+
+
+def expected_closest(origin: int, n: int, mask: int) -> list[int]:
+    # Distances of the n closest places of mask, from every reachable node.
+    nodes, distances = pathfinder.reachable_within(origin, 2**31 - 1, loading_desc="")
+    types = pathfinder.nodes.types
+    places = [d for node, d in zip(nodes, distances) if types[node] & mask]
+    return places[:n]
+
+
+def general_test(
+    pathfinder: PathFinder, origin: int, n: int, mask: int, goal_directed: bool
+):
+    found = pathfinder.closest_n_nodes(
+        origin, n, mask, loading_desc="", goal_directed=goal_directed
+    )
+    types = pathfinder.nodes.types
+    assert all(types[node] & mask for node, _ in found), "found a node of no category"
+    distances = [distance for _, distance in found]
+    expected = expected_closest(origin, n, mask)
+    assert distances == expected, f"{origin=}, {mask=}, {distances=}, {expected=}"
+
+
+def test_mask_dijkstra():
+    for origin in origins:
+        general_test(pathfinder, origin, 8, CHARGING_STATION, False)
+
+
+def test_mask_goal_directed():
+    for origin in origins:
+        general_test(pathfinder, origin, 8, CHARGING_STATION, True)
+
+
+def test_combined_mask():
+    for origin in origins:
+        general_test(pathfinder, origin, 5, CHARGING_STATION | EATING_PLACE, True)
+
+
+def test_more_than_there_are():
+    # Asking for more places than exist finds all of them.
+    mask = CHARGING_STATION | EATING_PLACE
+    count = len(CategoryIndex(pathfinder.nodes).nodes(mask))
+    general_test(pathfinder, origins[0], count + 10, mask, True)
+
+
+def test_predicate_matches_mask():
+    # A function of a Node finds the same places as the mask.
+    for origin in origins:
+        found = pathfinder.closest_n_nodes(
+            origin, 8, lambda node: bool(node.type & PLACENAME), loading_desc=""
+        )
+        expected = pathfinder.closest_n_nodes(origin, 8, PLACENAME, loading_desc="")
+        assert [d for _, d in found] == [d for _, d in expected], f"{origin=}"
+
+
+if __name__ == "__main__":
+    pathfinder = preprocess(
+        "island_noder.txt",
+        "island_kanter.txt",
+        "island_interessepkt.txt",
+        dict(list(ICELAND_LANDMARKS.items())[:2]),
+    )
+    origins = [0, 5000, 11_111, len(pathfinder.nodes) - 1]
+
+    _vars = vars().copy()
+    for name, value in _vars.items():
+        if name.startswith("test_"):
+            print(name)
+            try:
+                value()
+            except AssertionError as e:
+                print("Exception!")
+                print(str(e))
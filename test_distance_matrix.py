@@ -0,0 +1,64 @@
+from pathfinding import PathFinder
+from file_handling import read_complete
+from contraction import contract, load_hierarchy, save_hierarchy
+from utils import hour_min_sec_to_sec as seconds
+import os
+
+karvag, gjemmnes, trondheim, oslo = 3292784, 7352330, 7425499, 3430400
+sources = [karvag, trondheim, oslo]
+targets = [gjemmnes, oslo, trondheim]
+
+
+def general_test(
+    matrix: list[list[int | float]],
+    source: int,
+    target: int,
+    target_seconds: int,
+):
+    distance = matrix[sources.index(source)][targets.index(target)]
+    assert distance // 100 == target_seconds, f"{distance//100=}, {target_seconds}"
+
+
+def test_dijkstra_matrix():
+    matrix, paths = pathfinder.distance_matrix(sources, targets, paths=True)
+    general_test(matrix, karvag, gjemmnes, seconds(0, 40, 46))
+    general_test(matrix, trondheim, oslo, seconds(5, 53, 26))
+    general_test(matrix, oslo, trondheim, seconds(5, 53, 19))
+    general_test(matrix, trondheim, trondheim, 0)
+
+    path_length = len(paths[0][0])
+    assert path_length == 329, f"{path_length=}, 329"
+    path_length = len(paths[2][2])
+    assert path_length == 2013, f"{path_length=}, 2013"
+
+
+def test_ch_matrix():
+    dijkstra_matrix, _ = pathfinder.distance_matrix(sources, targets)
+    pathfinder.set_hierarchy(load_hierarchy(hierarchy_file))
+    matrix, paths = pathfinder.distance_matrix(sources, targets)
+    pathfinder.hierarchy = None
+
+    assert paths is None
+    assert matrix == dijkstra_matrix, f"{matrix=}, {dijkstra_matrix=}"
+
+
+if __name__ == "__main__":
+    loading_bar = False
+    hierarchy_file = "hierarchy.ch"
+
+    nodes = read_complete(
+        "noder.txt", "kanter.txt", "interessepkt.txt", loading_bar=loading_bar
+    )
+    if not os.path.exists(hierarchy_file):
+        save_hierarchy(contract(nodes, loading_bar=loading_bar), hierarchy_file)
+    pathfinder = PathFinder(nodes, loading_bar)
+
+    _vars = vars().copy()
+    for name, value in _vars.items():
+        if name.startswith("test_"):
+            print(name)
+            try:
+                value()
+            except AssertionError as e:
+                print("Exception!")
+                print(str(e))
@@ -0,0 +1,57 @@
+from file_handling import parse_files
+import os
+import shutil
+import tempfile
+
+files = ("island_noder.txt", "island_kanter.txt", "island_interessepkt.txt")
+
+
+def general_test(workers: int, chunked: bool = True, files: tuple = files):
+    graph, *edges = parse_files(*files, workers=workers, chunked=chunked)
+    assert graph.latitudes == line_graph.latitudes, "latitudes differ"
+    assert graph.longitudes == line_graph.longitudes, "longitudes differ"
+    assert graph.types == line_graph.types, "types differ"
+    assert graph.names == line_graph.names, "names differ"
+    for name, parsed, line in zip(("sources", "targets", "weights"), edges, line_edges):
+        assert parsed == line, f"{name} differ"
+
+
+def test_chunked_one_worker():
+    general_test(1)
+
+
+def test_chunked_workers():
+    general_test(4)
+
+
+def test_blank_lines():
+    # Copies of the files with a blank line after the first entry and at the
+    # end, which both parsers skip.
+    directory = tempfile.mkdtemp()
+    try:
+        copies = list()
+        for file_name in files:
+            with open(file_name, "r") as f:
+                lines = f.readlines()
+            copy = os.path.join(directory, file_name)
+            with open(copy, "w") as f:
+                f.writelines([*lines[:2], "\n", *lines[2:], "\n", "  \n"])
+            copies.append(copy)
+        general_test(1, True, tuple(copies))
+        general_test(1, False, tuple(copies))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    line_graph, *line_edges = parse_files(*files, chunked=False)
+
+    _vars = vars().copy()
+    for name, value in _vars.items():
+        if name.startswith("test_"):
+            print(name)
+            try:
+                value()
+            except AssertionError as e:
+                print("Exception!")
+                print(str(e))
@@ -0,0 +1,115 @@
+from file_handling import read_complete
+from graph import Graph
+from graph_cache import HEADER, VERSION, cache_file_name, load_graph, source_stamp
+import os
+import shutil
+import tempfile
+
+files = ("island_noder.txt", "island_kanter.txt", "island_interessepkt.txt")
+
+
+def same_graph(graph: Graph, other: Graph) -> bool:
+    return (
+        graph.offsets == other.offsets
+        and graph.targets == other.targets
+        and graph.weights == other.weights
+        and graph.latitudes == other.latitudes
+        and graph.longitudes == other.longitudes
+        and graph.types == other.types
+        and graph.names == other.names
+    )
+
+
+def general_test(reverse: bool):
+    # The cache is written from the parsed files, and read back the same.
+    cached = read_complete(*copies, reverse=reverse)
+    assert load_graph(cache_file_name(copies[0], reverse), stamp(), reverse)
+    graph = read_complete(*files, reverse=reverse, use_cache=False)
+    assert same_graph(cached, graph), "cached graph differs from the parsed one"
+
+
+def stamp() -> tuple[int, ...]:
+    return source_stamp(*copies)
+
+
+def rewrite_header(**fields):
+    # Changes header fields of the forward cache in place.
+    names = ("magic", "version", "flags")
+    with open(cache_file_name(copies[0]), "r+b") as f:
+        header = list(HEADER.unpack(f.read(HEADER.size)))
+        for name, value in fields.items():
+            header[names.index(name)] = value
+        f.seek(0)
+        f.write(HEADER.pack(*header))
+
+
+def test_cache_forward():
+    general_test(False)
+
+
+def test_cache_reverse():
+    general_test(True)
+
+
+def test_rebuild_on_mtime_change():
+    read_complete(*copies)
+    cache_file = cache_file_name(copies[0])
+    status = os.stat(copies[1])
+    os.utime(copies[1], ns=(status.st_atime_ns, status.st_mtime_ns + 10**9))
+    assert load_graph(cache_file, stamp()) is None, "stale cache was loaded"
+    read_complete(*copies)
+    assert load_graph(cache_file, stamp()) is not None, "cache was not rebuilt"
+
+
+def test_rebuild_on_size_change():
+    read_complete(*copies)
+    cache_file = cache_file_name(copies[0])
+    with open(copies[2], "a") as f:
+        f.write("\n")
+    assert load_graph(cache_file, stamp()) is None, "stale cache was loaded"
+    read_complete(*copies)
+    assert load_graph(cache_file, stamp()) is not None, "cache was not rebuilt"
+
+
+def test_reject_bad_magic():
+    read_complete(*copies)
+    rewrite_header(magic=b"NOTAGRPH")
+    assert load_graph(cache_file_name(copies[0]), stamp()) is None
+
+
+def test_reject_bad_version():
+    read_complete(*copies)
+    rewrite_header(version=VERSION + 1)
+    assert load_graph(cache_file_name(copies[0]), stamp()) is None
+
+
+def test_reject_wrong_direction():
+    read_complete(*copies)
+    assert load_graph(cache_file_name(copies[0]), stamp(), reverse=True) is None
+
+
+def test_reject_truncated():
+    read_complete(*copies)
+    cache_file = cache_file_name(copies[0])
+    with open(cache_file, "r+b") as f:
+        f.truncate(os.path.getsize(cache_file) // 2)
+    assert load_graph(cache_file, stamp()) is None
+
+
+if __name__ == "__main__":
+    # The tests change the files they read, so they run on copies.
+    directory = tempfile.mkdtemp()
+    copies = tuple(shutil.copy(file_name, directory) for file_name in files)
+
+    _vars = vars().copy()
+    try:
+        for name, value in _vars.items():
+            if name.startswith("test_"):
+                print(name)
+                try:
+                    value()
+                except AssertionError as e:
+                    print("Exception!")
+                    print(str(e))
+    finally:
+        shutil.rmtree(directory)
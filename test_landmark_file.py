@@ -0,0 +1,104 @@
+from alt_preprocess import (
+    HEADER,
+    ICELAND_LANDMARKS,
+    MAGIC,
+    VERSION,
+    convert_preprocess,
+    load_preprocess,
+    preprocess,
+    write_landmark_tables,
+)
+from utils import Preprocess, UNREACHABLE
+import os
+import shutil
+import tempfile
+
+
+def write_csv(to_landmarks: Preprocess, from_landmarks: Preprocess, file_name: str):
+    # The preprocess.csv format: a header with the number of landmarks and
+    # nodes, then a line per node with its distance to every landmark followed
+    # by its distance from every landmark.
+    with open(file_name, "w") as f:
+        f.write(f"{len(to_landmarks)} {len(to_landmarks[0])}\n")
+        for node in range(len(to_landmarks[0])):
+            fields = [table[node] for table in (*to_landmarks, *from_landmarks)]
+            f.write(
+                " ".join("inf" if v == UNREACHABLE else str(v) for v in fields) + "\n"
+            )
+
+
+def general_test(name: str, to_landmarks: Preprocess, from_landmarks: Preprocess):
+    # Loaded files stay mapped, so every test writes its own.
+    csv_file = os.path.join(directory, f"{name}.csv")
+    landmark_file = os.path.join(directory, f"{name}.landmarks")
+    write_csv(to_landmarks, from_landmarks, csv_file)
+    convert_preprocess(csv_file, landmark_file)
+    loaded_to, loaded_from = load_preprocess(landmark_file)
+    assert [list(t) for t in loaded_to] == [list(t) for t in to_landmarks], "to"
+    assert [list(t) for t in loaded_from] == [list(t) for t in from_landmarks], "from"
+
+
+def expect_rejected(name: str, header_fields: tuple, size_change: int = 0):
+    landmark_file = os.path.join(directory, f"{name}.landmarks")
+    write_landmark_tables(
+        pathfinder.to_landmarks, pathfinder.from_landmarks, landmark_file
+    )
+    with open(landmark_file, "r+b") as f:
+        f.write(HEADER.pack(*header_fields))
+        f.truncate(os.path.getsize(landmark_file) + size_change)
+    try:
+        load_preprocess(landmark_file)
+    except ValueError:
+        return
+    raise AssertionError(f"{header_fields} was not rejected")
+
+
+def test_csv_round_trip():
+    general_test("reachable", pathfinder.to_landmarks, pathfinder.from_landmarks)
+
+
+def test_csv_round_trip_unreachable():
+    # Every other node unreachable, to check that inf survives the round trip.
+    to_landmarks = [
+        [UNREACHABLE if node % 2 else d for node, d in enumerate(table)]
+        for table in pathfinder.to_landmarks
+    ]
+    general_test("unreachable", to_landmarks, pathfinder.from_landmarks)
+
+
+def test_reject_bad_magic():
+    landmarks, nodes = len(pathfinder.to_landmarks), len(pathfinder.nodes)
+    expect_rejected("magic", (b"NOTLMARK", VERSION, landmarks, nodes))
+
+
+def test_reject_bad_version():
+    landmarks, nodes = len(pathfinder.to_landmarks), len(pathfinder.nodes)
+    expect_rejected("version", (MAGIC, VERSION + 1, landmarks, nodes))
+
+
+def test_reject_truncated():
+    landmarks, nodes = len(pathfinder.to_landmarks), len(pathfinder.nodes)
+    expect_rejected("truncated", (MAGIC, VERSION, landmarks, nodes), -4)
+
+
+if __name__ == "__main__":
+    pathfinder = preprocess(
+        "island_noder.txt",
+        "island_kanter.txt",
+        "island_interessepkt.txt",
+        dict(list(ICELAND_LANDMARKS.items())[:2]),
+    )
+    directory = tempfile.mkdtemp()
+
+    _vars = vars().copy()
+    try:
+        for name, value in _vars.items():
+            if name.startswith("test_"):
+                print(name)
+                try:
+                    value()
+                except AssertionError as e:
+                    print("Exception!")
+                    print(str(e))
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,110 @@
+from categories import CHARGING_STATION, EATING_PLACE
+from nearest_places import (
+    HEADER,
+    NearestPlaces,
+    load_nearest_places,
+    nearest_places,
+    save_nearest_places,
+)
+from file_handling import read_complete_bidirectional
+from pathfinding import PathFinder
+import os
+import shutil
+import tempfile
+
+K = 4
+
+
+def expected_closest(origin: int, n: int, mask: int) -> list[tuple[int, int]]:
+    # The n closest places of mask with their distances, from a full search.
+    nodes, distances = pathfinder.reachable_within(origin, 2**31 - 1, loading_desc="")
+    types = pathfinder.nodes.types
+    places = [(node, d) for node, d in zip(nodes, distances) if types[node] & mask]
+    return places[:n]
+
+
+def general_test(table: NearestPlaces, origin: int, n: int):
+    found = table.lookup(origin, n)
+    expected = expected_closest(origin, n, table.mask)
+    assert [d for _, d in found] == [d for _, d in expected], f"{origin=}, {n=}"
+    # Places at the same distance may come in any order.
+    distance_of = dict(expected_closest(origin, len(pathfinder.nodes), table.mask))
+    assert all(distance_of[place] == d for place, d in found), f"{origin=}"
+
+
+def test_lookup():
+    for origin in origins:
+        for n in range(1, K + 1):
+            general_test(tables[CHARGING_STATION], origin, n)
+
+
+def test_lookup_combined_mask():
+    for origin in origins:
+        general_test(tables[CHARGING_STATION | EATING_PLACE], origin, K)
+
+
+def test_closest_n_nodes_uses_table():
+    # closest_n_nodes answers from the table for n up to k, and searches past it.
+    table = tables[CHARGING_STATION]
+    pathfinder.set_nearest_places(table)
+    try:
+        for origin in origins:
+            for n in (K, K + 2):
+                found = pathfinder.closest_n_nodes(
+                    origin, n, CHARGING_STATION, loading_desc=""
+                )
+                expected = expected_closest(origin, n, CHARGING_STATION)
+                assert [d for _, d in found] == [d for _, d in expected], f"{n=}"
+            pathfinder.closest_n_nodes(origin, K, CHARGING_STATION, loading_desc="")
+            assert pathfinder.considered_nodes == 0, "the table was not used"
+    finally:
+        pathfinder.nearest_places.clear()
+
+
+def test_save_and_load():
+    table = tables[CHARGING_STATION]
+    file_name = os.path.join(directory, "charging.places")
+    save_nearest_places(table, file_name)
+    loaded = load_nearest_places(file_name)
+    assert (loaded.mask, loaded.k) == (table.mask, table.k), "header differs"
+    assert list(loaded.places) == list(table.places), "places differ"
+    assert list(loaded.distances) == list(table.distances), "distances differ"
+
+
+def test_reject_bad_magic():
+    table = tables[CHARGING_STATION]
+    file_name = os.path.join(directory, "magic.places")
+    save_nearest_places(table, file_name)
+    with open(file_name, "r+b") as f:
+        f.write(HEADER.pack(b"NOTPLACE", 1, table.mask, len(table), table.k))
+    try:
+        load_nearest_places(file_name)
+    except ValueError:
+        return
+    raise AssertionError("bad magic was not rejected")
+
+
+if __name__ == "__main__":
+    nodes, reverse_nodes = read_complete_bidirectional(
+        "island_noder.txt", "island_kanter.txt", "island_interessepkt.txt"
+    )
+    pathfinder = PathFinder(nodes, False, reverse_nodes)
+    origins = [0, 5000, 11_111, len(nodes) - 1]
+    tables = {
+        mask: nearest_places(reverse_nodes, mask, K)
+        for mask in (CHARGING_STATION, CHARGING_STATION | EATING_PLACE)
+    }
+    directory = tempfile.mkdtemp()
+
+    _vars = vars().copy()
+    try:
+        for name, value in _vars.items():
+            if name.startswith("test_"):
+                print(name)
+                try:
+                    value()
+                except AssertionError as e:
+                    print("Exception!")
+                    print(str(e))
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,75 @@
+from alt_preprocess import ICELAND_LANDMARKS, preprocess
+from categories import CHARGING_STATION, EATING_PLACE
+from typing import Callable
+
+
+def on_both_queues(method: Callable, *arguments, **keywords) -> tuple:
+    # The result of method with the heapq queue and with the radix queue.
+    results = list()
+    for queue in ("heap", "radix"):
+        pathfinder.queue = queue
+        try:
+            results.append(method(*arguments, loading_desc="", **keywords))
+        finally:
+            pathfinder.queue = "heap"
+    return tuple(results)
+
+
+def general_test(method: Callable, **keywords):
+    # Distances and paths are the same, as the radix queue breaks ties on
+    # the node like heapq.
+    for origin, destination in pairs:
+        (heap_distance, heap_path), (radix_distance, radix_path) = on_both_queues(
+            method, origin, destination, **keywords
+        )
+        assert heap_distance == radix_distance, f"{origin=}, {destination=}"
+        heap_path = [node.number for node in heap_path]
+        radix_path = [node.number for node in radix_path]
+        assert heap_path == radix_path, f"{origin=}, {destination=}: paths differ"
+
+
+def test_dijkstra():
+    general_test(pathfinder.run_dijkstra)
+
+
+def test_alt():
+    general_test(pathfinder.run_alt)
+
+
+def test_alt_eager():
+    general_test(pathfinder.run_alt, estimate_mode="eager")
+
+
+def test_closest_n_nodes():
+    for origin, _ in pairs:
+        for mask in (CHARGING_STATION, CHARGING_STATION | EATING_PLACE):
+            for goal_directed in (False, True):
+                heap, radix = on_both_queues(
+                    pathfinder.closest_n_nodes,
+                    origin,
+                    8,
+                    mask,
+                    goal_directed=goal_directed,
+                )
+                assert heap == radix, f"{origin=}, {mask=}, {goal_directed=}"
+
+
+if __name__ == "__main__":
+    pathfinder = preprocess(
+        "island_noder.txt",
+        "island_kanter.txt",
+        "island_interessepkt.txt",
+        dict(list(ICELAND_LANDMARKS.items())[:2]),
+    )
+    last = len(pathfinder.nodes) - 1
+    pairs = [(0, last), (last, 0), (5000, 11_111), (11_111, 5000), (42, 42)]
+
+    _vars = vars().copy()
+    for name, value in _vars.items():
+        if name.startswith("test_"):
+            print(name)
+            try:
+                value()
+            except AssertionError as e:
+                print("Exception!")
+                print(str(e))
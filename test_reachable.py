@@ -0,0 +1,92 @@
+from file_handling import read_complete
+from heapq import heappop, heappush
+from pathfinding import PathFinder
+import os
+import shutil
+import tempfile
+
+
+def all_distances(origins: list[int]) -> dict[int, int]:
+    # Plain Dijkstra over every node reachable from any of origins.
+    distances: dict[int, int] = dict()
+    heap = [(0, origin) for origin in origins]
+    while heap:
+        distance, node = heappop(heap)
+        if node in distances:
+            continue
+        distances[node] = distance
+        for target, weight in pathfinder.nodes.edges(node):
+            if target not in distances:
+                heappush(heap, (distance + weight, target))
+    return distances
+
+
+def general_test(origins: list[int], budget: int):
+    nodes, distances = pathfinder.reachable_within_any(origins, budget, loading_desc="")
+    expected = {
+        node: distance
+        for node, distance in all_distances(origins).items()
+        if distance <= budget
+    }
+    found = dict(zip(nodes, distances))
+    assert len(found) == len(nodes), f"{origins=}, {budget=}: repeated nodes"
+    assert found == expected, f"{origins=}, {budget=}: {len(found)=}, {len(expected)=}"
+    assert list(distances) == sorted(distances), f"{origins=}, {budget=}: unsorted"
+
+
+def test_budgets():
+    for budget in (1000, 10_000, 50_000, 200_000):
+        general_test([origin], budget)
+
+
+def test_zero_budget():
+    general_test([origin], 0)
+
+
+def test_whole_graph():
+    general_test([origin], 2**31 - 1)
+
+
+def test_many_origins():
+    for budget in (5000, 30_000):
+        general_test([origin, len(pathfinder.nodes) - 1, 5000], budget)
+
+
+def test_boundary():
+    budget = 30_000
+    boundary_file = os.path.join(directory, "boundary.csv")
+    nodes, _ = pathfinder.reachable_within(
+        origin, budget, boundary_file, loading_desc=""
+    )
+    reachable = set(nodes)
+    expected = {
+        pathfinder.nodes.pos(node)
+        for node in nodes
+        if any(target not in reachable for target, _ in pathfinder.nodes.edges(node))
+    }
+    with open(boundary_file) as f:
+        found = {tuple(map(float, line.split(","))) for line in f}
+    assert found == expected, f"{len(found)=}, {len(expected)=}"
+
+
+if __name__ == "__main__":
+    pathfinder = PathFinder(
+        read_complete(
+            "island_noder.txt", "island_kanter.txt", "island_interessepkt.txt"
+        )
+    )
+    origin = 11_111
+    directory = tempfile.mkdtemp()
+
+    _vars = vars().copy()
+    try:
+        for name, value in _vars.items():
+            if name.startswith("test_"):
+                print(name)
+                try:
+                    value()
+                except AssertionError as e:
+                    print("Exception!")
+                    print(str(e))
+    finally:
+        shutil.rmtree(directory)
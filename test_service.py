@@ -0,0 +1,160 @@
+from alt_preprocess import ICELAND_LANDMARKS, preprocess_and_save
+from categories import CHARGING_STATION
+from service import RoutingService
+from typing import Any
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+
+files = ("island_noder.txt", "island_kanter.txt", "island_interessepkt.txt")
+
+
+class CountingExecutor:
+    # Passes jobs on to the executor of the service, counting them.
+    def __init__(self, executor) -> None:
+        self.executor = executor
+        self.submitted = 0
+
+    def submit(self, *arguments):
+        self.submitted += 1
+        return self.executor.submit(*arguments)
+
+
+async def request(target: str, method: str = "GET") -> tuple[int, Any]:
+    reader, writer = await asyncio.open_unix_connection(socket_file)
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b"\r\n\r\n", 1)
+    return int(head.split()[1]), json.loads(body)
+
+
+def serve(client) -> Any:
+    # Runs the client coroutine against the service on a Unix socket.
+    async def run():
+        server = await asyncio.start_unix_server(service.handle, socket_file)
+        async with server:
+            return await client()
+
+    return asyncio.run(run())
+
+
+def get(target: str, method: str = "GET") -> tuple[int, Any]:
+    return serve(lambda: request(target, method))
+
+
+def expect_status(target: str, status: int, method: str = "GET"):
+    found, body = get(target, method)
+    assert found == status, f"{target}: {found=}, {status=}, {body=}"
+    assert "error" in body, f"{target}: no error message"
+
+
+def general_test(origin: int, destination: int):
+    distance, path = pathfinder.run_alt(origin, destination, loading_desc="")
+    status, body = get(f"/route?origin={origin}&destination={destination}")
+    assert status == 200, f"{status=}, {body=}"
+    assert body["distance"] == distance, f"{body['distance']=}, {distance=}"
+    assert body["path"] == [list(node.pos) for node in path], "paths differ"
+
+    status, body = get(f"/distance?origin={origin}&destination={destination}")
+    assert status == 200, f"{status=}, {body=}"
+    assert body["distance"] == distance, f"{body['distance']=}, {distance=}"
+
+
+def test_route():
+    general_test(0, 10000)
+
+
+def test_route_back():
+    general_test(10000, 0)
+
+
+def test_route_by_coordinates():
+    latitude, longitude = pathfinder.nodes.pos(500)
+    status, body = get(f"/route?origin={latitude},{longitude}&destination=20000")
+    distance, _ = pathfinder.run_alt(500, 20000, loading_desc="")
+    assert status == 200 and body["distance"] == distance, f"{status=}, {body=}"
+
+
+def test_closest():
+    found = pathfinder.closest_n_nodes(5000, 3, CHARGING_STATION, loading_desc="")
+    status, body = get("/closest?origin=5000&n=3&category=charging")
+    assert status == 200, f"{status=}, {body=}"
+    nodes = [(place["node"], place["distance"]) for place in body["nodes"]]
+    assert nodes == found, f"{nodes=}, {found=}"
+
+
+def test_bad_requests():
+    last = len(pathfinder.nodes)
+    expect_status("/route?origin=abc&destination=5", 400)
+    expect_status(f"/route?origin={last}&destination=5", 400)
+    expect_status("/route?origin=5", 400)
+    expect_status("/route?origin=91,10&destination=5", 400)
+    expect_status("/closest?origin=5&category=nothing", 400)
+    expect_status("/closest?origin=5&n=0", 400)
+    expect_status("/closest?origin=5&n=101", 400)
+    expect_status("/closest?origin=5&n=many", 400)
+    expect_status("/nowhere?origin=5", 404)
+    expect_status("/route?origin=0&destination=5", 405, "POST")
+
+
+def test_coalesced_and_full_queue():
+    # A duplicate of a query in flight shares its result, while a different
+    # query is turned away when the queue is full.
+    async def client() -> list[tuple[int, Any]]:
+        # Keeps the only worker busy, so that the first query stays in flight.
+        sleeping = asyncio.get_running_loop().run_in_executor(
+            executor.executor, time.sleep, 0.5
+        )
+        first = asyncio.create_task(request("/distance?origin=0&destination=9000"))
+        while not service.in_flight:
+            await asyncio.sleep(0.01)
+        duplicate = asyncio.create_task(request("/distance?origin=0&destination=9000"))
+        other = asyncio.create_task(request("/distance?origin=1&destination=9000"))
+        results = await asyncio.gather(first, duplicate, other)
+        await sleeping
+        return results
+
+    executor = service.executor = CountingExecutor(service.executor)
+    service.max_queue = 1
+    try:
+        (status, body), (duplicate_status, duplicate_body), (other_status, _) = serve(
+            client
+        )
+    finally:
+        service.executor = executor.executor
+        service.max_queue = max_queue
+    assert status == duplicate_status == 200, f"{status=}, {duplicate_status=}"
+    assert body == duplicate_body, f"{body=}, {duplicate_body=}"
+    assert executor.submitted == 1, f"{executor.submitted} queries ran"
+    assert other_status == 503, f"{other_status=}"
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    copies = tuple(shutil.copy(file_name, directory) for file_name in files)
+    landmark_file = os.path.join(directory, "island_preprocess.landmarks")
+    pathfinder = preprocess_and_save(
+        *copies, landmark_file, dict(list(ICELAND_LANDMARKS.items())[:2]), False
+    )
+    socket_file = os.path.join(directory, "service.sock")
+    max_queue = 64
+    service = RoutingService(*copies, landmark_file, workers=1, max_queue=max_queue)
+
+    _vars = vars().copy()
+    try:
+        for name, value in _vars.items():
+            if name.startswith("test_"):
+                print(name)
+                try:
+                    value()
+                except AssertionError as e:
+                    print("Exception!")
+                    print(str(e))
+    finally:
+        service.close()
+        shutil.rmtree(directory)
@@ -0,0 +1,142 @@
+from array import array
+from file_handling import read_complete
+from graph import Graph
+from graph_cache import source_stamp
+from math import cos, radians
+from pathfinding import PathFinder
+from spatial_index import build_index, index_file_name, load_index, read_spatial_index
+import os
+import random
+import shutil
+import tempfile
+
+files = ("island_noder.txt", "island_kanter.txt", "island_interessepkt.txt")
+
+
+def squared_distance(graph: Graph, node: int, latitude: float, longitude: float):
+    # The same equirectangular distance as SpatialIndex.nearest, in degrees.
+    dy = graph.latitudes[node] - latitude
+    dx = (graph.longitudes[node] - longitude) * cos(radians(latitude))
+    return dy * dy + dx * dx
+
+
+def brute_force(latitude: float, longitude: float, k: int) -> list[float]:
+    # Distances of the k closest nodes with edges leaving them.
+    offsets = graph.offsets
+    return sorted(
+        squared_distance(graph, node, latitude, longitude)
+        for node in range(len(graph))
+        if offsets[node] != offsets[node + 1]
+    )[:k]
+
+
+def random_points(count: int, margin: float) -> list[tuple[float, float]]:
+    # Points over the bounding box of the graph, widened by margin degrees on
+    # every side so that some fall outside of the grid.
+    generator = random.Random(2023)
+    latitudes, longitudes = graph.latitudes, graph.longitudes
+    return [
+        (
+            generator.uniform(min(latitudes) - margin, max(latitudes) + margin),
+            generator.uniform(min(longitudes) - margin, max(longitudes) + margin),
+        )
+        for _ in range(count)
+    ]
+
+
+def general_test(latitude: float, longitude: float, k: int):
+    found = index.nearest(latitude, longitude, k)
+    distances = [
+        squared_distance(graph, node, latitude, longitude) for node, _ in found
+    ]
+    expected = brute_force(latitude, longitude, k)
+    assert distances == expected, f"{latitude=}, {longitude=}, {k=}"
+
+
+def test_snap_inside():
+    for latitude, longitude in random_points(200, 0):
+        general_test(latitude, longitude, 1)
+
+
+def test_snap_outside():
+    for latitude, longitude in random_points(200, 1):
+        general_test(latitude, longitude, 1)
+
+
+def test_nearest_k():
+    for latitude, longitude in random_points(50, 0.1):
+        general_test(latitude, longitude, 5)
+
+
+def test_snap_on_node():
+    for node in (0, 5000, 11_111, len(graph) - 2):
+        assert index.snap(*graph.pos(node)) == node, f"{node=}"
+
+
+def test_coordinates_as_locations():
+    pathfinder = PathFinder(graph)
+    pathfinder.set_spatial_index(index)
+    origin, destination = random_points(2, 0)
+    distance, path = pathfinder.run_dijkstra(origin, destination, loading_desc="")
+    expected, _ = pathfinder.run_dijkstra(
+        index.snap(*origin), index.snap(*destination), loading_desc=""
+    )
+    assert distance == expected, f"{distance=}, {expected=}"
+    assert path[0].number == index.snap(*origin), "path does not start at origin"
+
+
+def test_collinear_nodes():
+    # Nodes on one latitude, and nodes at one point, have no area to divide
+    # into cells.
+    count = 10_000
+    for step in (1e-4, 0.0):
+        line = Graph(
+            array("d", [64.0] * count), array("d", (i * step for i in range(count)))
+        )
+        line.set_edges(range(count - 1), range(1, count), [1] * (count - 1))
+        line_index = build_index(line)
+        assert len(line_index.cell_offsets) <= count + 2, f"{step=}: too many cells"
+        for longitude in (-1.0, 0.0, 0.123456, 0.5, 2.0):
+            node = line_index.snap(64.1, longitude)
+            target = min(
+                squared_distance(line, other, 64.1, longitude)
+                for other in range(count - 1)
+            )
+            found = squared_distance(line, node, 64.1, longitude)
+            assert found == target, f"{step=}, {longitude=}: {found=}, {target=}"
+
+
+def test_index_file():
+    # The index is written next to the graph cache, read back the same, and
+    # rebuilt when the files it was built from change.
+    directory = tempfile.mkdtemp()
+    try:
+        copies = tuple(shutil.copy(file_name, directory) for file_name in files)
+        read_spatial_index(copies[0], copies[1], graph)
+        stamp = source_stamp(copies[0], copies[1])
+        loaded = load_index(index_file_name(copies[0]), graph, stamp)
+        assert loaded is not None, "the index file was not written"
+        assert list(loaded.cell_offsets) == list(index.cell_offsets), "cells differ"
+        assert list(loaded.cell_nodes) == list(index.cell_nodes), "nodes differ"
+
+        status = os.stat(copies[1])
+        os.utime(copies[1], ns=(status.st_atime_ns, status.st_mtime_ns + 10**9))
+        stamp = source_stamp(copies[0], copies[1])
+        assert load_index(index_file_name(copies[0]), graph, stamp) is None, "stale"
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    graph = read_complete(*files)
+    index = build_index(graph)
+
+    _vars = vars().copy()
+    for name, value in _vars.items():
+        if name.startswith("test_"):
+            print(name)
+            try:
+                value()
+            except AssertionError as e:
+                print("Exception!")
+                print(str(e))
@@ -0,0 +1,116 @@
+from alt_preprocess import ICELAND_LANDMARKS, preprocess
+from categories import CHARGING_STATION, EATING_PLACE
+from pathfinding import SearchStats
+from typing import Any
+import random
+import sys
+import threading
+
+THREADS = 4
+ROUNDS = 3
+
+# Counters of SearchStats, the times differ between runs.
+COUNTERS = ("settled", "relaxed_edges", "heap_pushes", "stale_pops")
+
+
+def comparable(result: Any) -> Any:
+    # Paths are compared by node number, as every query makes new Nodes.
+    if isinstance(result, tuple) and isinstance(result[1], list):
+        distance, path = result
+        return distance, [node.number for node in path]
+    return result
+
+
+def counters(stats: SearchStats) -> tuple[int, ...]:
+    return tuple(getattr(stats, name) for name in COUNTERS)
+
+
+def run_query(name: str, arguments: tuple) -> tuple[Any, SearchStats]:
+    result, stats = getattr(pathfinder, name)(*arguments, loading_desc="", stats=True)
+    return comparable(result), stats
+
+
+def run_threads(work: list[int]) -> list[list[tuple[int, Any, SearchStats]]]:
+    # Every thread runs the queries in its own order, all starting at once.
+    results: list[list[tuple[int, Any, SearchStats]]] = [[] for _ in range(THREADS)]
+    barrier = threading.Barrier(THREADS)
+
+    def thread(number: int):
+        order = list(work)
+        random.Random(number).shuffle(order)
+        barrier.wait()
+        for i in order:
+            result, stats = run_query(*queries[i])
+            results[number].append((i, result, stats))
+
+    threads = [threading.Thread(target=thread, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_results_match_single_thread():
+    for results in run_threads(list(range(len(queries))) * ROUNDS):
+        assert len(results) == len(queries) * ROUNDS, f"{len(results)=}"
+        for i, result, _ in results:
+            assert result == expected[i][0], f"{queries[i]}: result differs"
+
+
+def test_stats_are_per_query():
+    seen = set()
+    for results in run_threads(list(range(len(queries))) * ROUNDS):
+        for i, _, stats in results:
+            found, target = counters(stats), counters(expected[i][1])
+            assert found == target, f"{queries[i]}: {found=}, {target=}"
+            assert id(stats) not in seen, f"{queries[i]}: stats object shared"
+            seen.add(id(stats))
+
+
+def test_thread_stats_are_its_last_query():
+    # The stats of the context of a thread are those of its own last query.
+    mismatches = list()
+
+    def thread(i: int):
+        result, stats = run_query(*queries[i])
+        if pathfinder.stats is not stats or result != expected[i][0]:
+            mismatches.append(queries[i])
+
+    threads = [threading.Thread(target=thread, args=(i,)) for i in range(len(queries))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not mismatches, f"{mismatches=}"
+
+
+if __name__ == "__main__":
+    pathfinder = preprocess(
+        "island_noder.txt",
+        "island_kanter.txt",
+        "island_interessepkt.txt",
+        dict(list(ICELAND_LANDMARKS.items())[:2]),
+    )
+    last = len(pathfinder.nodes) - 1
+    queries: list[tuple[str, tuple]] = [
+        ("run_alt", (0, last)),
+        ("run_alt", (11_111, 5000)),
+        ("run_dijkstra", (last, 0)),
+        ("run_dijkstra", (5000, 11_111)),
+        ("closest_n_nodes", (5000, 8, CHARGING_STATION)),
+        ("closest_n_nodes", (42, 8, CHARGING_STATION | EATING_PLACE)),
+    ]
+    expected = [run_query(*query) for query in queries]
+    # Switch threads often, so that the searches interleave.
+    sys.setswitchinterval(1e-5)
+
+    _vars = vars().copy()
+    for name, value in _vars.items():
+        if name.startswith("test_"):
+            print(name)
+            try:
+                value()
+            except AssertionError as e:
+                print("Exception!")
+                print(str(e))
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Sequence
 
 
 @dataclass
@@ -12,6 +12,8 @@ class Node:
 
 
 class LoadingBarMocker:
+    n: int = 0
+
     def update(self, i: int):
         pass
 
@@ -19,7 +21,10 @@ class LoadingBarMocker:
         pass
 
 
-Preprocess = list[list[float | int]]
+# Landmark distances are stored as unsigned 32 bit centiseconds, with
+# UNREACHABLE in place of float("inf").
+UNREACHABLE = 0xFFFFFFFF
+Preprocess = list[Sequence[int]]
 
 
 def is_placename(node: Node) -> bool: